@@ -0,0 +1,67 @@
+from pathlib import Path
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+parser = ArgumentParser(description="Report references whose export, build or test time has regressed.")
+
+parser.add_argument("--history-db",
+                    action="store",
+                    default=None,
+                    help="SQLite database written by run-package-tests.py and export-recipes.py. Defaults to .build-times.sqlite in the top of the repository.",)
+parser.add_argument("--threshold",
+                    action="store",
+                    type=float,
+                    default=0.25,
+                    help="Report phases that are slower than their baseline by more than this fraction.",)
+parser.add_argument("--window",
+                    action="store",
+                    type=int,
+                    default=5,
+                    help="Number of previous runs the baseline (median) is computed from.",)
+parser.add_argument("--min-history",
+                    action="store",
+                    type=int,
+                    default=3,
+                    help="Minimum number of previous runs needed to report a regression.",)
+parser.add_argument("--min-duration",
+                    action="store",
+                    type=float,
+                    default=1.0,
+                    help="Ignore phases that took less than this many seconds.",)
+
+
+args = parser.parse_args()
+
+class colors:
+    PASS = '\033[92m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+
+top_dir = Path(subprocess.check_output(['git','rev-parse','--show-toplevel']).strip().decode('utf-8'))
+
+sys.path.insert(0, str(top_dir))
+from cd3_conan_package_recipes import history
+
+db_file = Path(args.history_db or top_dir/".build-times.sqlite")
+if not db_file.exists():
+    print(f"No build time history found in {db_file}.")
+    sys.exit(0)
+
+db = history.open_db(db_file)
+regressions = history.find_regressions(db,
+                                       threshold=args.threshold,
+                                       window=args.window,
+                                       min_history=args.min_history,
+                                       min_duration=args.min_duration)
+
+if len(regressions) == 0:
+    sys.stdout.write(colors.PASS+"No regressions found.\n"+colors.ENDC)
+    sys.exit(0)
+
+for r in regressions:
+    sys.stdout.write(colors.FAIL+f"{r['reference']} ({r['test']}, {r['phase']}): "+colors.ENDC)
+    sys.stdout.write(f"{r['duration']:.1f}s vs. baseline {r['baseline']:.1f}s (+{100*r['change']:.0f}%) at commit {r['git_commit']}\n")
+
+sys.exit(1)
@@ -0,0 +1,180 @@
+from pathlib import Path
+import subprocess
+import json
+import sys
+import os
+from argparse import ArgumentParser
+
+top_dir = Path(subprocess.check_output(['git','rev-parse','--show-toplevel']).strip().decode('utf-8'))
+sys.path.insert(0, str(top_dir))
+from cd3_conan_package_recipes.conan_driver import BACKENDS, get_driver, get_conan_major_version, get_file_name, split_user_channel
+
+parser = ArgumentParser(description="Run the bench_package of a recipe against several of its versions, and optionally several versions of its dependencies, and compare the results.")
+
+parser.add_argument("name",
+                    action="store",
+                    help="Name of the recipe to benchmark.",)
+parser.add_argument("--versions",
+                    action="store",
+                    nargs='+',
+                    default=None,
+                    help="Versions to compare. The first one is the baseline. Defaults to all the versions in config.yml, in the order they are listed.",)
+parser.add_argument("--root",
+                    action="store",
+                    default="recipes",
+                    help="Recipe directory to look for the recipe in, e.g. recipes-v1 for the legacy recipes. These need conan 1 on the PATH and the cli backend.",)
+parser.add_argument("--bench-package",
+                    action="store",
+                    default=None,
+                    help="bench_package folder to use for every version. Defaults to the bench_package in the folder of the last version that has one.",)
+parser.add_argument("--vary",
+                    action="append",
+                    default=[],
+                    help="Name of a requirement, e.g. eigen. Every version is benchmarked with each version of this requirement listed by any of the compared versions.",)
+parser.add_argument("--override",
+                    action="append",
+                    default=[],
+                    help="Benchmark every version with this reference in place of the requirement with the same name, e.g. eigen/3.4.0.",)
+parser.add_argument("--options-variant",
+                    action="append",
+                    default=[],
+                    help="Comma separated options to benchmark every version with, in addition to the other variants, e.g. hdf5/*:threadsafe=True,hdf5/*:shared=True. Give it more than once to compare several builds of the same version.",)
+parser.add_argument("--user-channel-string",
+                    action="store",
+                    default="cd3/devel",
+                    help="Specify the user/channel string to export packages too.",)
+parser.add_argument("--backend",
+                    action="store",
+                    choices=BACKENDS,
+                    default="auto",
+                    help="Run conan commands in-process with the conan API, or with the conan CLI. 'auto' uses the API if it is available.",)
+parser.add_argument("--repetitions",
+                    action="store",
+                    type=int,
+                    default=5,
+                    help="Number of times each benchmark is repeated.",)
+parser.add_argument("--lockfile-dir",
+                    action="store",
+                    default=None,
+                    help="Directory the lockfile of each reference is stored in and reused from. Defaults to .lockfiles in the top of the repository.",)
+parser.add_argument("-s", "--settings",
+                    action="append",
+                    default=[],
+                    help="Setting passed to conan, e.g. -s compiler.version=13.",)
+parser.add_argument("-o", "--options",
+                    action="append",
+                    default=[],
+                    help="Option passed to conan, e.g. -o unitconvert/*:ipo=True.",)
+parser.add_argument("-c", "--conf",
+                    action="append",
+                    default=[],
+                    help="Configuration passed to conan, e.g. -c user.cd3:bench_size_mb=4096 to set a parameter of the benchmark.",)
+parser.add_argument("-pr", "--profile",
+                    action="store",
+                    default=None,
+                    help="Profile passed to conan.",)
+
+
+args = parser.parse_args()
+
+class colors:
+    PASS = '\033[92m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+
+os.chdir(top_dir)
+output_dir = top_dir/"test-output"/"benchmarks"
+output_dir.mkdir(parents=True, exist_ok=True)
+
+from cd3_conan_package_recipes.recipe_index import load_index
+from cd3_conan_package_recipes import benchmarks
+from cd3_conan_package_recipes import lockfiles
+from cd3_conan_package_recipes import base_recipe
+
+recipes = {r.version:r for r in load_index(args.root, top_dir/".recipe-index-cache.json")
+           if r.name == args.name and r.layout == "config"}
+if not recipes:
+    print(f"Could not find a recipe named {args.name} in {args.root}.")
+    sys.exit(1)
+versions = args.versions or list(recipes)
+missing = [v for v in versions if v not in recipes]
+if missing:
+    print(f"Could not find version(s) {', '.join(missing)} of {args.name}. Available versions: {', '.join(recipes)}.")
+    sys.exit(1)
+
+# the benchmarks only use the public interface of the library, so one bench_package is
+# used for all versions, even the ones that are packaged by an older recipe.
+bench_folders = [benchmarks.get_bench_folder(recipes[v]) for v in versions if benchmarks.get_bench_folder(recipes[v])]
+bench_folder = Path(args.bench_package).absolute() if args.bench_package else (bench_folders[-1] if bench_folders else None)
+if bench_folder is None:
+    print(f"None of the compared versions of {args.name} have a bench_package. Use --bench-package.")
+    sys.exit(1)
+
+overrides = []
+for name in args.vary:
+    for version in versions:
+        for kind, req in recipes[version].requirements:
+            if req.split("/")[0].lower() == name.lower() and req not in overrides:
+                overrides.append(req)
+overrides += [o for o in args.override if o not in overrides]
+
+conan_args = ['-c', f'{benchmarks.REPETITIONS_CONF}={args.repetitions}']
+conan_args += [a for s in args.settings for a in ['-s', s]]
+conan_args += [a for o in args.options for a in ['-o', o]]
+conan_args += [a for c in args.conf for a in ['-c', c]]
+if args.profile:
+    conan_args += ['-pr', args.profile]
+
+driver = get_driver(args.backend)
+conan_major_version = get_conan_major_version(driver)
+if overrides and conan_major_version != 1 and not args.profile:
+    # the override profiles are composed with the default profile
+    conan_args += ['-pr', 'default']
+
+# the legacy recipes load their python_requires from the cache, so it has to be exported
+# to the same user/channel before them.
+if base_recipe.export_base_recipe(driver, args.user_channel_string, log_file=output_dir/"cd3-base.export.log") == "failed":
+    sys.stdout.write(colors.FAIL+f"Could not export {base_recipe.BASE_REFERENCE}@{args.user_channel_string}. See {output_dir/'cd3-base.export.log'} for details.\n"+colors.ENDC)
+
+# every version is benchmarked once for each combination of a requirement override
+# and a set of options. the label and conan arguments of each variant.
+override_variants = [(override, benchmarks.get_override_args(conan_major_version, override, output_dir)) for override in overrides] or [("", [])]
+options_variants = [(options, [a for o in options.split(",") for a in ['-o', o]]) for options in args.options_variant] or [("", [])]
+variants = [(" ".join(l for l in [override, options] if l), override_args + options_args)
+            for override, override_args in override_variants for options, options_args in options_variants]
+
+lockfile_dir = Path(args.lockfile_dir or top_dir/".lockfiles")
+
+labels = []
+results = []
+for version in versions:
+    recipe = recipes[version]
+    reference = f"{recipe.name}/{version}@{args.user_channel_string}"
+    if conan_major_version == 1:
+        cmd = ['export', recipe.conanfile, reference]
+    else:
+        cmd = ['export', recipe.folder, '--name', recipe.name, '--version', version] + split_user_channel(args.user_channel_string)
+        cmd += lockfiles.get_lockfile_args(lockfiles.get_lockfile(lockfile_dir, reference))
+    log_file = output_dir/(get_file_name(reference)+".export.log")
+    if driver.run(cmd, log_file=log_file).returncode:
+        sys.stdout.write(reference+": "+colors.FAIL+f"Export failed. See {log_file} for details.\n"+colors.ENDC)
+        for variant, variant_args in variants:
+            labels.append(f"{version} {variant}".strip())
+            results.append(None)
+        continue
+    for variant, variant_args in variants:
+        label = f"{version} {variant}".strip()
+        sys.stdout.write(f"Benchmarking {reference}"+(f" with {variant}" if variant else "")+"...\n")
+        result, log_file = benchmarks.run_benchmark(driver, bench_folder, reference, output_dir, conan_args + variant_args,
+                                                    name=f"{reference} {variant}".strip(),
+                                                    graph_json=conan_major_version != 1)
+        if result is None:
+            sys.stdout.write(label+": "+colors.FAIL+f"Failed. See {log_file} for details.\n"+colors.ENDC)
+        labels.append(label)
+        results.append(result)
+
+sys.stdout.write(benchmarks.format_comparison(labels, [r['benchmarks'] if r else None for r in results]))
+(output_dir/(args.name+"-comparison.json")).write_text(json.dumps({'labels':labels, 'conan_args':conan_args, 'runs':results}, indent=2))
+
+sys.exit(1 if any(r is None for r in results) else 0)
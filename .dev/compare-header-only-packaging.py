@@ -0,0 +1,110 @@
+from pathlib import Path
+import subprocess
+import tempfile
+import tarfile
+import filecmp
+import shutil
+import time
+import sys
+import ast
+import re
+from argparse import ArgumentParser
+
+parser = ArgumentParser(description="Package a header-only library with a full cmake configure, build and install, and with the compiler-free configure and install used by the recipes, and compare the time taken and the installed files.")
+
+parser.add_argument("source",
+                    action="store",
+                    help="Source directory or archive of the library, e.g. a file in the store written by prefetch-sources.py.",)
+parser.add_argument("-D",
+                    action="append",
+                    dest="definitions",
+                    default=[],
+                    help="Cache variable to pass to cmake, e.g. -D BUILD_TESTS=OFF.",)
+
+
+args = parser.parse_args()
+
+class colors:
+    PASS = '\033[92m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+
+top_dir = Path(subprocess.check_output(['git','rev-parse','--show-toplevel']).strip().decode('utf-8'))
+
+# the recipes get header_only_cmakelists from the cd3-base python_requires. load just that
+# function from the recipe, the rest of it needs conan 1.
+base_recipe = top_dir/"recipes-v1"/"cd3-base"/"conanfile.py"
+function = next(node for node in ast.parse(base_recipe.read_text()).body
+                if isinstance(node, ast.FunctionDef) and node.name == "header_only_cmakelists")
+namespace = {'re':re}
+exec(compile(ast.Module(body=[function], type_ignores=[]), str(base_recipe), 'exec'), namespace)
+header_only_cmakelists = namespace['header_only_cmakelists']
+
+
+def extract(source, dest):
+    source = Path(source)
+    if source.is_dir():
+        shutil.copytree(source, dest)
+        return
+    with tarfile.open(source) as archive:
+        archive.extractall(dest.parent/"archive")
+    # strip the root folder of the archive, as the recipes do
+    roots = list((dest.parent/"archive").iterdir())
+    (roots[0] if len(roots) == 1 and roots[0].is_dir() else dest.parent/"archive").rename(dest)
+
+
+def package(source_dir, build, log):
+    prefix = source_dir.parent/"package"
+    cmd = ['cmake', '-S', str(source_dir), '-B', str(source_dir.parent/"build"), f'-DCMAKE_INSTALL_PREFIX={prefix}']
+    cmd += ['-D'+d for d in args.definitions]
+    start = time.monotonic()
+    with open(log, 'w') as f:
+        if subprocess.run(cmd, stdout=f, stderr=subprocess.STDOUT).returncode:
+            return None, time.monotonic()-start
+        if build and subprocess.run(['cmake', '--build', str(source_dir.parent/"build")], stdout=f, stderr=subprocess.STDOUT).returncode:
+            return None, time.monotonic()-start
+        if subprocess.run(['cmake', '--install', str(source_dir.parent/"build")], stdout=f, stderr=subprocess.STDOUT).returncode:
+            return None, time.monotonic()-start
+    return prefix, time.monotonic()-start
+
+
+def list_files(root):
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*") if not p.is_dir())
+
+
+with tempfile.TemporaryDirectory(prefix="cd3-header-only-") as tmp:
+    tmp = Path(tmp)
+    for variant in ["full", "header-only"]:
+        (tmp/variant).mkdir()
+        extract(args.source, tmp/variant/"src")
+    cmakelists = tmp/"header-only"/"src"/"CMakeLists.txt"
+    cmakelists.write_text(header_only_cmakelists(cmakelists.read_text()))
+
+    full, full_time = package(tmp/"full"/"src", True, tmp/"full.log")
+    header_only, header_only_time = package(tmp/"header-only"/"src", False, tmp/"header-only.log")
+    sys.stdout.write(f"configure, build and install:        {full_time:.2f}s\n")
+    sys.stdout.write(f"compiler-free configure and install: {header_only_time:.2f}s\n")
+    for prefix, log in [(full, tmp/"full.log"), (header_only, tmp/"header-only.log")]:
+        if prefix is None:
+            sys.stdout.write(colors.FAIL+"Packaging failed:\n"+colors.ENDC+log.read_text())
+            sys.exit(1)
+
+    full_files = list_files(full)
+    header_only_files = list_files(header_only)
+    if full_files != header_only_files:
+        sys.stdout.write(colors.FAIL+"The packages contain different files:\n"+colors.ENDC)
+        for file in sorted(set(full_files) ^ set(header_only_files)):
+            sys.stdout.write(f"  {'full' if file in full_files else 'header-only'} only: {file}\n")
+        sys.exit(1)
+
+    different = [file for file in full_files if not filecmp.cmp(full/file, header_only/file, shallow=False)]
+    for file in different:
+        sys.stdout.write(f"  contents differ: {file}\n")
+        if file.endswith("ConfigVersion.cmake"):
+            sys.stdout.write("    (expected, the pointer size is not known without a compiler. the check that uses it is disabled with ARCH_INDEPENDENT)\n")
+    unexpected = [file for file in different if not file.endswith("ConfigVersion.cmake")]
+    if unexpected:
+        sys.stdout.write(colors.FAIL+"The packages differ.\n"+colors.ENDC)
+        sys.exit(1)
+    sys.stdout.write(colors.PASS+f"The packages contain the same {len(full_files)} files.\n"+colors.ENDC)
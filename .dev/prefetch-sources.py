@@ -0,0 +1,94 @@
+from pathlib import Path
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+parser = ArgumentParser(description="Download the source archives of every recipe into a store that conan can use as its download cache.")
+
+parser.add_argument("name",
+                    action="store",
+                    nargs='*',
+                    help="Only fetch the sources of packages with name 'name'.",)
+parser.add_argument("--store",
+                    action="store",
+                    default=None,
+                    help="Directory to download the sources to. Defaults to .source-cache in the top of the repository.",)
+parser.add_argument("--jobs",
+                    action="store",
+                    type=int,
+                    default=8,
+                    help="Number of downloads to run in parallel.",)
+parser.add_argument("--timeout",
+                    action="store",
+                    type=float,
+                    default=60,
+                    help="Timeout for each connection in seconds.",)
+parser.add_argument("--retries",
+                    action="store",
+                    type=int,
+                    default=2,
+                    help="Number of times to retry a failed download.",)
+parser.add_argument("--configure",
+                    action="store_true",
+                    help="Add a line to conan's global.conf that points the download cache at the store when the harness runs.",)
+parser.add_argument("--clean",
+                    action="store_true",
+                    help="Remove files from the store that are not used by any recipe.",)
+
+
+args = parser.parse_args()
+
+class colors:
+    PASS = '\033[92m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+
+top_dir = Path(subprocess.check_output(['git','rev-parse','--show-toplevel']).strip().decode('utf-8'))
+
+sys.path.insert(0, str(top_dir))
+from cd3_conan_package_recipes import sources
+from cd3_conan_package_recipes.conan_driver import CliDriver
+
+store = Path(args.store or top_dir/".source-cache").absolute()
+
+all_sources = sources.get_sources([top_dir/"recipes", top_dir/"recipes-v1"])
+if len(args.name) > 0:
+    wanted = [source for source in all_sources if any(ref.split("/")[0] in args.name for ref in source['references'])]
+else:
+    wanted = all_sources
+
+# these are fetched from the network on every build. regenerate them with utils/generate-conandata.py.
+for reference, reason in sources.get_unverified_sources([top_dir/"recipes", top_dir/"recipes-v1"]):
+    if len(args.name) == 0 or reference.split("/")[0] in args.name:
+        sys.stdout.write(colors.FAIL+f"{reference}: not checksum-verified ({reason}), it can not be stored.\n"+colors.ENDC)
+
+sys.stdout.write(f"Fetching {len(wanted)} sources into {store}\n")
+failed = 0
+for result in sources.prefetch(wanted, store, jobs=args.jobs, timeout=args.timeout, retries=args.retries):
+    sys.stdout.write(", ".join(result['references'])+": ")
+    if result['status'] == "failed":
+        failed += 1
+        sys.stdout.write(colors.FAIL+"Failed\n"+colors.ENDC)
+        for error in result['errors']:
+            sys.stdout.write(f"  {error}\n")
+    elif result['status'] == "downloaded":
+        sys.stdout.write(colors.PASS+f"Downloaded ({result['size']/1e6:.1f} MB)\n"+colors.ENDC)
+    else:
+        sys.stdout.write(colors.PASS+"Present\n"+colors.ENDC)
+
+if args.clean:
+    for path in sources.clean(all_sources, store):
+        sys.stdout.write(f"Removed {path}\n")
+
+if args.configure:
+    conan_home = CliDriver().run(['config', 'home'], capture_output=True).stdout.strip()
+    try:
+        if sources.configure_conan(conan_home):
+            sys.stdout.write(f"Added '{sources.GLOBAL_CONF_LINE}' to {conan_home}/global.conf\n")
+    except RuntimeError as e:
+        sys.stdout.write(colors.FAIL+f"{e}\n"+colors.ENDC)
+        sys.exit(1)
+
+sys.stdout.write(f"Run conan with {sources.SOURCE_CACHE_ENV}={store} in the environment to use the store. See --configure.\n")
+sys.exit(1 if failed else 0)
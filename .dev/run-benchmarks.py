@@ -0,0 +1,244 @@
+from pathlib import Path
+import subprocess
+import platform
+import shutil
+import time
+import sys
+import os
+from argparse import ArgumentParser
+
+top_dir = Path(subprocess.check_output(['git','rev-parse','--show-toplevel']).strip().decode('utf-8'))
+sys.path.insert(0, str(top_dir))
+from cd3_conan_package_recipes.conan_driver import BACKENDS, get_driver, get_conan_major_version, get_file_name, split_user_channel
+
+parser = ArgumentParser(description="Run the bench_package of every recipe that has one, store the results, and fail if a benchmark has regressed.")
+
+parser.add_argument("name",
+                    action="store",
+                    nargs='*',
+                    help="Benchmark packages with name 'name'.",)
+parser.add_argument("--user-channel-string",
+                    action="store",
+                    default="cd3/devel",
+                    help="Specify the user/channel string to export packages too.",)
+parser.add_argument("--backend",
+                    action="store",
+                    choices=BACKENDS,
+                    default="auto",
+                    help="Run conan commands in-process with the conan API, or with the conan CLI. 'auto' uses the API if it is available.",)
+parser.add_argument("--repetitions",
+                    action="store",
+                    type=int,
+                    default=5,
+                    help="Number of times each benchmark is repeated.",)
+parser.add_argument("--cpu",
+                    action="store",
+                    type=int,
+                    default=None,
+                    help="CPU to pin the benchmarks to with taskset. Defaults to the last CPU this process may run on.",)
+parser.add_argument("--no-pin",
+                    action="store_true",
+                    help="Do not pin the benchmarks to a CPU.",)
+parser.add_argument("--history-db",
+                    action="store",
+                    default=None,
+                    help="SQLite database the results are stored in and compared with. Defaults to .benchmarks.sqlite in the top of the repository.",)
+parser.add_argument("--host",
+                    action="store",
+                    default=None,
+                    help="Name of the machine the results are stored under. Results are only compared with results from the same host. Defaults to the hostname.",)
+parser.add_argument("--threshold",
+                    action="store",
+                    type=float,
+                    default=0.10,
+                    help="Smallest change from the baseline, as a fraction, that is reported as a regression.",)
+parser.add_argument("--noise-factor",
+                    action="store",
+                    type=float,
+                    default=3.0,
+                    help="A benchmark has to be worse than its baseline by this many times its relative median absolute deviation to be reported as a regression.",)
+parser.add_argument("--window",
+                    action="store",
+                    type=int,
+                    default=5,
+                    help="Number of previous runs the baseline (median) is computed from.",)
+parser.add_argument("--min-history",
+                    action="store",
+                    type=int,
+                    default=3,
+                    help="Minimum number of previous runs needed to report a regression.",)
+parser.add_argument("--accept",
+                    action="store_true",
+                    help="Store the results as the new baseline, even if they regressed, and do not fail.",)
+parser.add_argument("--no-record",
+                    action="store_true",
+                    help="Do not store the results of this run.",)
+parser.add_argument("--lockfile-dir",
+                    action="store",
+                    default=None,
+                    help="Directory the lockfile of each reference is stored in and reused from. Defaults to .lockfiles in the top of the repository.",)
+parser.add_argument("--refresh-lockfiles",
+                    action="store_true",
+                    help="Resolve the version ranges of every reference again, instead of reusing the stored lockfiles.",)
+parser.add_argument("-s", "--settings",
+                    action="append",
+                    default=[],
+                    help="Setting passed to conan, e.g. -s compiler.version=13.",)
+parser.add_argument("-o", "--options",
+                    action="append",
+                    default=[],
+                    help="Option passed to conan, e.g. -o unitconvert/*:ipo=True.",)
+parser.add_argument("-c", "--conf",
+                    action="append",
+                    default=[],
+                    help="Configuration passed to conan, e.g. -c user.cd3:bench_size_mb=4096 to set a parameter of the benchmark.",)
+parser.add_argument("-pr", "--profile",
+                    action="store",
+                    default=None,
+                    help="Profile passed to conan.",)
+
+
+args = parser.parse_args()
+
+class colors:
+    PASS = '\033[92m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+
+os.chdir(top_dir)
+output_dir = top_dir/"test-output"/"benchmarks"
+output_dir.mkdir(parents=True, exist_ok=True)
+
+from cd3_conan_package_recipes.recipe_index import load_index
+from cd3_conan_package_recipes.reporting import write_json, write_junit
+from cd3_conan_package_recipes import benchmark_history
+from cd3_conan_package_recipes import benchmarks
+from cd3_conan_package_recipes import lockfiles
+from cd3_conan_package_recipes import base_recipe
+
+driver = get_driver(args.backend)
+conan_major_version = get_conan_major_version(driver)
+
+# the legacy recipes load their python_requires from the cache, so it has to be exported
+# to the same user/channel before them.
+if base_recipe.export_base_recipe(driver, args.user_channel_string, log_file=output_dir/"cd3-base.export.log") == "failed":
+    sys.stdout.write(colors.FAIL+f"Could not export {base_recipe.BASE_REFERENCE}@{args.user_channel_string}. See {output_dir/'cd3-base.export.log'} for details.\n"+colors.ENDC)
+
+# the recipes in recipes/ need conan 2 and the ones in recipes-v1/ need conan 1, so only
+# the benchmarks of one of them can be run by the conan we have.
+roots = {2:"recipes", 1:"recipes-v1"}
+benches = {}
+for major_version, root in roots.items():
+    benches[root] = []
+    for recipe in load_index(root, top_dir/".recipe-index-cache.json"):
+        if len(args.name) > 0 and (recipe.name not in args.name):
+            continue
+        bench_folder = benchmarks.get_bench_folder(recipe)
+        if bench_folder is None:
+            continue
+        if recipe.version is None:
+            print(f"Could not determine version number for {recipe.conanfile}. skipping")
+            continue
+        benches[root].append((recipe, bench_folder.absolute()))
+for major_version, root in roots.items():
+    if major_version != conan_major_version and benches[root]:
+        print(f"Skipping {len(benches[root])} benchmark(s) in {root}, they need conan {major_version}.")
+benches = benches.get(roots.get(conan_major_version), [])
+
+conan_args = ['-c', f'{benchmarks.REPETITIONS_CONF}={args.repetitions}']
+conan_args += [a for s in args.settings for a in ['-s', s]]
+conan_args += [a for o in args.options for a in ['-o', o]]
+conan_args += [a for c in args.conf for a in ['-c', c]]
+if args.profile:
+    conan_args += ['-pr', args.profile]
+
+# pin the benchmarks to one cpu, so they are not migrated between cores (and caches) while
+# they run. the last cpu is the least likely to be handling interrupts.
+if not args.no_pin:
+    if shutil.which("taskset") is None or not hasattr(os, "sched_getaffinity"):
+        sys.stdout.write("WARNING: taskset was not found. The benchmarks will not be pinned to a CPU.\n")
+    else:
+        cpu = args.cpu if args.cpu is not None else max(os.sched_getaffinity(0))
+        sys.stdout.write(f"Pinning the benchmarks to CPU {cpu}\n")
+        conan_args += ['-c', f'{benchmarks.LAUNCHER_CONF}=taskset -c {cpu}']
+
+host = args.host or platform.node()
+db = benchmark_history.open_db(args.history_db or top_dir/".benchmarks.sqlite")
+git_commit = subprocess.run(['git','rev-parse','HEAD'], capture_output=True, text=True).stdout.strip() or None
+
+lockfile_dir = Path(args.lockfile_dir or top_dir/".lockfiles")
+
+# the status of every benchmark run, written to test-output/benchmarks/results.{json,xml}
+results = []
+exported = []
+for recipe, bench_folder in benches:
+    reference = f"{recipe.name}/{recipe.version}@{args.user_channel_string}"
+    start = time.monotonic()
+    if conan_major_version == 1:
+        cmd = ['export', recipe.conanfile, reference]
+    else:
+        cmd = ['export', recipe.folder, '--name', recipe.name, '--version', recipe.version] + split_user_channel(args.user_channel_string)
+        cmd += lockfiles.get_lockfile_args(lockfiles.get_lockfile(lockfile_dir, reference))
+    log_file = output_dir/(get_file_name(reference)+".export.log")
+    if driver.run(cmd, log_file=log_file).returncode:
+        sys.stdout.write(reference+": "+colors.FAIL+f"Export failed. See {log_file} for details.\n"+colors.ENDC)
+        results.append({'name':reference, 'test':"bench_package", 'status':"fail", 'duration':time.monotonic()-start,
+                        'phases':{}, 'log_file':log_file})
+        continue
+    exported.append((reference, bench_folder))
+
+# lock the graph of every reference in one step, so the benchmarks do not resolve it again.
+# conan 1 has different lockfile commands and format, so the legacy recipes are not locked.
+locked = {}
+if conan_major_version != 1:
+    locked, statuses = lockfiles.lock_references(driver, [reference for reference, bench_folder in exported], lockfile_dir,
+                                                 conan_args, refresh=args.refresh_lockfiles, log_dir=output_dir)
+    for reference, status in statuses.items():
+        if status == "failed":
+            sys.stdout.write(f"WARNING: could not lock the dependencies of {reference}. They will be resolved by the benchmark.\n")
+
+for reference, bench_folder in exported:
+    start = time.monotonic()
+    sys.stdout.write(f"Benchmarking {reference}...\n")
+    run, log_file = benchmarks.run_benchmark(driver, bench_folder, reference, output_dir,
+                                             conan_args + lockfiles.get_lockfile_args(locked.get(reference)),
+                                             graph_json=conan_major_version != 1)
+    result = {'name':reference, 'test':"bench_package", 'status':"fail", 'duration':time.monotonic()-start,
+              'phases':{}, 'log_file':log_file}
+    results.append(result)
+    if run is None:
+        sys.stdout.write(reference+": "+colors.FAIL+f"Failed. See {log_file} for details.\n"+colors.ENDC)
+        continue
+
+    # conan 1 does not tell us which binary was benchmarked, so its results are only told
+    # apart by reference.
+    package_id = (run['package'] or {}).get('package_id') or ""
+    regressions, new = benchmark_history.find_regressions(db, host, reference, package_id, run['benchmarks'],
+                                                          threshold=args.threshold,
+                                                          noise_factor=args.noise_factor,
+                                                          window=args.window,
+                                                          min_history=args.min_history)
+    result.update({'package_id':package_id, 'regressions':regressions})
+    for r in regressions:
+        sys.stdout.write(colors.FAIL+f"{reference} ({r['benchmark']}): "+colors.ENDC)
+        sys.stdout.write(f"{r['value']:.4g} {r['unit'] or ''} vs. baseline {r['baseline']:.4g} ({100*r['change']:+.1f}%, allowed -{100*r['allowed']:.1f}%)\n")
+    if new:
+        sys.stdout.write(f"{reference}: no baseline for {', '.join(new)} yet\n")
+    if regressions and not args.accept:
+        result['status'] = "fail"
+        sys.stdout.write(reference+": "+colors.FAIL+"Regressed\n"+colors.ENDC)
+    else:
+        result['status'] = "pass"
+        sys.stdout.write(reference+": "+colors.PASS+"Pass\n"+colors.ENDC)
+
+    if not args.no_record:
+        statuses = {} if args.accept else {r['benchmark']:"regressed" for r in regressions}
+        benchmark_history.record_run(db, host, reference, package_id, run['benchmarks'], statuses=statuses, git_commit=git_commit)
+
+db.close()
+
+write_json(results, output_dir/"results.json")
+write_junit(results, output_dir/"results.xml", suite_name="conan-benchmarks")
+
+sys.exit(1 if any(r['status'] == "fail" for r in results) else 0)
@@ -2,10 +2,16 @@ from pathlib import Path
 import subprocess
 import os
 import sys
-import re
+import json
+import shlex
+import time
+import hashlib
 from argparse import ArgumentParser
 from multiprocessing import Pool
-import concurrent.futures
+
+top_dir = Path(subprocess.check_output(['git','rev-parse','--show-toplevel']).strip().decode('utf-8'))
+sys.path.insert(0, str(top_dir))
+from cd3_conan_package_recipes.conan_driver import BACKENDS, get_driver, get_conan_version, get_file_name
 
 parser = ArgumentParser(description="Run conan package tests for the recipes that have one.")
 
@@ -19,8 +25,54 @@ parser.add_argument("--user-channel-string",
                     help="Specify the user/channel string to export packages too.",)
 parser.add_argument("--jobs",
                     action="store",
+                    type=int,
                     default=None,
                     help="Run tests in parallel.",)
+parser.add_argument("--backend",
+                    action="store",
+                    choices=BACKENDS,
+                    default="auto",
+                    help="Run conan commands in-process with the conan API, or with the conan CLI. 'auto' uses the API if it is available.",)
+parser.add_argument("--build-jobs",
+                    action="store",
+                    type=int,
+                    default=None,
+                    help="Total number of compiler jobs shared by all parallel builds. Defaults to the number of CPUs.",)
+parser.add_argument("--no-cache",
+                    action="store_true",
+                    help="Run every test, even if it passed before with the same recipe revision, dependency graph, test_package and profile.",)
+parser.add_argument("--history-db",
+                    action="store",
+                    default=None,
+                    help="SQLite database the duration of each phase is appended to. Defaults to .build-times.sqlite in the top of the repository.",)
+parser.add_argument("--no-history",
+                    action="store_true",
+                    help="Do not record the durations of this run.",)
+parser.add_argument("--source-cache",
+                    action="store",
+                    default=None,
+                    help="Directory filled by .dev/prefetch-sources.py that conan should read sources from. Defaults to .source-cache in the top of the repository, if it exists.",)
+parser.add_argument("--ccache",
+                    action="store_true",
+                    help="Compile through ccache, with one cache shared by all parallel jobs, and report the hit rate of each job.",)
+parser.add_argument("--ccache-dir",
+                    action="store",
+                    default=None,
+                    help="Directory of the shared ccache. Defaults to .ccache in the top of the repository.",)
+parser.add_argument("--ccache-size",
+                    action="store",
+                    default="5G",
+                    help="Maximum size of the shared ccache, e.g. 500M or 5G.",)
+parser.add_argument("--no-prebuild",
+                    action="store_true",
+                    help="Do not build the missing dependencies of all tests before running them. Each test will build what it needs.",)
+parser.add_argument("--lockfile-dir",
+                    action="store",
+                    default=None,
+                    help="Directory the lockfile of each reference is stored in and reused from. Defaults to .lockfiles in the top of the repository.",)
+parser.add_argument("--refresh-lockfiles",
+                    action="store_true",
+                    help="Resolve the version ranges of every reference again, instead of reusing the stored lockfiles.",)
 
 
 args = parser.parse_args()
@@ -31,86 +83,341 @@ class colors:
     ENDC = '\033[0m'
 
 
-top_dir = Path(subprocess.check_output(['git','rev-parse','--show-toplevel']).strip().decode('utf-8'))
 os.chdir(top_dir)
 log_dir = top_dir/"test-output"
 log_dir.mkdir(exist_ok=True)
 
+from cd3_conan_package_recipes.recipe_index import load_index
+from cd3_conan_package_recipes.reporting import PhaseTimer, write_json, write_junit
+from cd3_conan_package_recipes import history
+from cd3_conan_package_recipes.scheduling import estimate_cost, order_longest_first, predict_makespan
+from cd3_conan_package_recipes.jobserver import setup_build_jobs
+from cd3_conan_package_recipes import sources
+from cd3_conan_package_recipes import compiler_cache
+from cd3_conan_package_recipes import lockfiles
+from cd3_conan_package_recipes import base_recipe
+from cd3_conan_package_recipes import matrix
+
+# each worker process creates its own driver, so the conan API is loaded
+# once per worker instead of once per test.
+driver = None
+# conan arguments passed to every command that may build something, e.g. to limit the
+# number of compiler jobs each build uses.
+build_args = []
+# log the result of each compilation to a file per job, see compiler_cache.read_stats_log.
+use_ccache = False
+def init_worker(backend, conan_args, ccache):
+    global driver, build_args, use_ccache
+    driver = get_driver(backend)
+    build_args = conan_args
+    use_ccache = ccache
+
+def set_stats_log(log_file):
+    if not use_ccache:
+        return None
+    stats_log = Path(str(log_file)+".ccache-stats")
+    stats_log.unlink(missing_ok=True)
+    os.environ['CCACHE_STATSLOG'] = str(stats_log)
+    return stats_log
+
+def plan_prebuild(tests):
+    '''
+    Compute the build order for every reference that will be tested and merge them,
+    so that each missing binary (identified by its package_id) is only built once.
+
+    Returns a list of levels. The binaries in a level only depend on binaries in
+    earlier levels, so each level can be built in parallel.
+    '''
+    plan_dir = log_dir/"prebuild"
+    plan_dir.mkdir(exist_ok=True)
+
+    files = []
+    lockfile = {t['package_reference']:t.get('lockfile') for t in tests}
+    for package_reference in sorted(lockfile):
+        name = get_file_name(package_reference)
+        cmd = ['graph', 'build-order', '--requires', package_reference, '--build', 'missing', '--order-by', 'configuration']
+        cmd += lockfiles.get_lockfile_args(lockfile[package_reference])
+        order = driver.run_json(cmd, log_file=plan_dir/(name+".log"))
+        if order is None:
+            print(f"Could not compute the build order for {package_reference}. See {plan_dir/(name+'.log')} for details.")
+            continue
+        file = plan_dir/(name+".json")
+        file.write_text(json.dumps(order))
+        files.append(file)
+
+    if len(files) == 0:
+        return []
+
+    if len(files) == 1:
+        merged = json.loads(files[0].read_text())
+    else:
+        cmd = ['graph', 'build-order-merge']
+        for file in files:
+            cmd += ['--file', str(file)]
+        merged = driver.run_json(cmd, log_file=plan_dir/"merge.log")
+        if merged is None:
+            print(f"Could not merge the build orders. See {plan_dir/'merge.log'} for details.")
+            return []
+
+    # the binaries are shared between tests, so they are built with the union of their lockfiles
+    merged_lockfile = lockfiles.merge_lockfiles(driver, lockfile.values(), plan_dir/"merged.lock", log_file=plan_dir/"merged.lock.log")
+
+    # only keep the binaries that need to be built
+    levels = [[{**item, 'lockfile':merged_lockfile} for item in level if item['binary'] == "Build"] for level in merged['order']]
+    return [level for level in levels if level]
+
+def run_prebuild(item):
+    binary = f"{item['ref']}:{item['package_id']}"
+    log_file = log_dir/"prebuild"/(get_file_name(binary)+".log")
+
+    cmd = ['install'] + shlex.split(item['build_args']) + build_args + lockfiles.get_lockfile_args(item.get('lockfile'))
+    with open(log_file,'w') as f:
+        f.write(f"Building {binary}\n")
+    stats_log = set_stats_log(log_file)
+    start = time.monotonic()
+    result = driver.run(cmd, log_file=log_file)
+
+    return {'binary':binary, 'reference':item['ref'].split("#")[0], 'package_id':item['package_id'],
+            'result':result, 'duration':time.monotonic()-start, 'log_file':log_file,
+            'compiler_cache':compiler_cache.read_stats_log(stats_log) if stats_log else None}
+
+def format_cache_stats(stats):
+    if not stats:
+        return ""
+    return f" (ccache: {stats['hits']}/{stats['hits']+stats['misses']} hits, {100*stats['hit_rate']:.0f}%)"
+
+def get_test_key(spec):
+    '''
+    Lock the dependency graph of a test and return a key that identifies everything
+    the result of the test depends on: the recipe revision and the revisions of all its
+    dependencies (from the lockfile), the test_package contents and the profile.
+
+    Returns a dict with the 'key', the 'lockfile' and the 'lock_time' spent locking the
+    graph. If the graph could not be locked, or there is no profile to hash, there is no
+    'key' and 'lockfile' is None, so the test always runs.
+    '''
+    if spec['profile_hash'] is None:
+        return {'lockfile':None}
+
+    log_file = get_file_name(spec['package_reference'])
+    lockfile = spec['lockfile']
+    with open(spec['log_dir']/(log_file+".lock.log"),'w') as f:
+        f.write(f"Locking dependencies for {spec['package_reference']}\n")
+    start = time.monotonic()
+    # reuse the stored lockfile if it is still current, so the graph is not resolved again
+    status = lockfiles.lock_reference(driver, spec['package_reference'], lockfile, spec['latest_revisions'],
+                                      refresh=spec['refresh_lockfile'], log_file=spec['log_dir']/(log_file+".lock.log"))
+    lock_time = time.monotonic() - start
+    if status == "failed":
+        return {'lock_time':lock_time, 'lockfile':None}
+
+    h = hashlib.sha256()
+    h.update(spec['profile_hash'].encode())
+    lock = json.loads(lockfile.read_text())
+    for section in ["requires", "build_requires", "python_requires"]:
+        # drop the timestamps, only the revisions matter
+        h.update(json.dumps([r.split("%")[0] for r in lock.get(section, [])]).encode())
+    for root, dirs, files in os.walk(spec['test_folder']):
+        dirs[:] = sorted(d for d in dirs if d != "build")
+        for file in sorted(files):
+            # CMakeUserPresets.json is written by conan when the test is built.
+            if file == "CMakeUserPresets.json":
+                continue
+            path = Path(root)/file
+            h.update(str(path.relative_to(spec['test_folder'])).encode())
+            h.update(path.read_bytes())
+    return {'key':h.hexdigest(), 'lockfile':lockfile, 'lock_time':lock_time}
+
 def run_test(spec):
     package_reference = spec['package_reference']
     test_folder = spec['test_folder']
     log_dir = spec['log_dir']
 
-    log_file = package_reference
-    for char in [".","/","@"]:
-        log_file = log_file.replace(char,"_")
+    log_file = get_file_name(package_reference)
 
     build_dir = log_dir/(log_file+".build.d")
 
-    cmd = ['conan', 'test', str(test_folder), package_reference, '-tbf', build_dir, '--build', 'missing']
+    cmd = ['test', str(test_folder), package_reference, '-c', f'tools.cmake.cmake_layout:test_folder={build_dir}', '--build', 'missing'] + build_args
+    # test against the graph the cache key was computed from. the test_package
+    # may add requirements of its own, so the lockfile is partial.
+    cmd += lockfiles.get_lockfile_args(spec.get('lockfile'))
     with open(log_dir/log_file,'w') as f:
         f.write(f"Running test for {package_reference} using {test_folder}\n")
-        f.flush()
-        result = subprocess.run(cmd, stdout=f, stderr=subprocess.STDOUT)
+    stats_log = set_stats_log(log_dir/log_file)
+    timer = PhaseTimer("graph")
+    result = driver.run(cmd, log_file=log_dir/log_file, on_line=timer.on_line)
+    phases = timer.stop()
+    # locking the graph for the result cache is part of graph resolution
+    phases['graph'] = phases.get('graph', 0.0) + spec.get('lock_time', 0.0)
 
-    return {'package_reference':spec['package_reference'], 'result':result}
+    return {'package_reference':spec['package_reference'], 'result':result, 'key':spec.get('key'),
+            'phases':phases, 'log_file':log_dir/log_file,
+            'compiler_cache':compiler_cache.read_stats_log(stats_log) if stats_log else None}
 
 
 tests = []
-# this loop will export recipes that follow the conancenter convention
-# on layout.
-for file in Path("recipes").glob("*/config.yml"):
-    try:
-        import yaml
-    except: print(f"ERROR: could not import pyyaml which is required to parse {str(file)}.")
+for recipe in load_index("recipes", top_dir/".recipe-index-cache.json"):
+    if len(args.name) > 0 and (recipe.name not in args.name):
+        continue
+    test_folder = Path(recipe.folder)/"test_package"
+    if str(test_folder) not in recipe.test_folders:
+        continue
+    if recipe.version is None:
+        print(f"Could not determine version number for {recipe.conanfile}. skipping")
+        continue
 
-    data = yaml.safe_load( file.read_text() )
-    root_dir = file.parent
-    name = root_dir.stem
-    if len(args.name) == 0 or (name in args.name):
-        for version in data.get("versions",{}):
-            recipe_folder = root_dir/data["versions"][version].get('folder',None)
-            if recipe_folder:
-                test_folder = (recipe_folder/"test_package").absolute()
-                package_reference = name+"/"+version+"@"+args.user_channel_string
-                if test_folder.exists():
-                    tests.append({'package_reference':package_reference,'test_folder':test_folder,'log_dir':log_dir})
+    package_reference = recipe.reference+"@"+args.user_channel_string
+    tests.append({'package_reference':package_reference,'test_folder':test_folder.absolute(),'log_dir':log_dir,
+                  'name':recipe.name,'requirements':[req for kind, req in recipe.requirements]})
 
 
+# share one budget of compiler jobs between all the builds that run in parallel. this has
+# to happen before the pool starts so the workers inherit MAKEFLAGS.
+workers = args.jobs or os.cpu_count()
+jobserver, jobs_args = setup_build_jobs(args.build_jobs or os.cpu_count(), workers)
+if jobserver:
+    sys.stdout.write(f"Sharing {jobserver.jobs} build jobs between {workers} workers with a make jobserver\n")
 
+# read source archives from the store filled by prefetch-sources.py instead of downloading them.
+# this has to be in the environment before any conan API is created.
+source_cache = Path(args.source_cache or top_dir/".source-cache").absolute()
+if args.source_cache or source_cache.exists():
+    os.environ[sources.SOURCE_CACHE_ENV] = str(source_cache)
 
+# the legacy recipes take the user/channel of their cd3-base python_requires from the
+# environment, so the workers have to inherit it too.
+os.environ[base_recipe.USER_CHANNEL_ENV] = args.user_channel_string
 
+# share one size-bounded ccache between all jobs. the conan cache and test-output/ are both
+# below the base dir, so builds of the same sources in different folders hit the same entries.
+use_ccache = False
+if args.ccache:
+    conan_home = Path(os.environ.get("CONAN_HOME", Path.home()/".conan2")).absolute()
+    ccache_args = compiler_cache.setup_ccache(Path(args.ccache_dir or top_dir/".ccache").absolute(), args.ccache_size,
+                                              base_dir=os.path.commonpath([conan_home, top_dir]))
+    if ccache_args is None:
+        sys.stdout.write("WARNING: ccache was not found. Building without it.\n")
+    else:
+        jobs_args += ccache_args
+        use_ccache = True
 
+with Pool(args.jobs, initializer=init_worker, initargs=(args.backend, jobs_args, use_ccache)) as p:
+    # the pool has been started, so the workers do not inherit this driver.
+    driver = get_driver(args.backend)
 
+    if base_recipe.export_base_recipe(driver, args.user_channel_string, log_file=log_dir/"cd3-base.export.log") == "failed":
+        sys.stdout.write(f"WARNING: could not export {base_recipe.BASE_REFERENCE}@{args.user_channel_string}. See {log_dir/'cd3-base.export.log'} for details.\n")
 
+    if sources.SOURCE_CACHE_ENV in os.environ:
+        conf = driver.run_json(['config', 'show', 'core.sources:download_cache']) or {}
+        if conf.get('core.sources:download_cache') == str(source_cache):
+            sys.stdout.write(f"Reading sources from {source_cache}\n")
+        else:
+            sys.stdout.write(f"WARNING: conan is not configured to read sources from {source_cache}. Run .dev/prefetch-sources.py --configure.\n")
 
-# this loop will export recpipes that follow our own custom convention
-# on layout.
-conanfiles = Path("recipes").glob("*/conanfile*.py")
-for file in  conanfiles:
-  name = file.parent.stem
-  if len(args.name) == 0 or (name in args.name):
-      test_folder = (file.parent/"test_package").absolute()
-      if test_folder.exists():
-          text = file.read_text()
-          match = re.search('''^\s*version\s*=\s*"([^"]*)"$''',text,flags=re.MULTILINE)
-          if match:
-              version = match.group(1)
-          else:
-              print(f"Could not determine version number for {file}. skipping")
-              continue
+    # skip the tests that have already passed with the same inputs.
+    result_cache_file = log_dir/"result-cache.json"
+    try:
+        result_cache = json.loads(result_cache_file.read_text())
+    except (OSError, ValueError):
+        result_cache = {}
+
+    profile = driver.run_json(['profile', 'show'])
+    profile_hash = hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest() if profile else None
+    # lock the graph of every reference in one step before anything is built. the
+    # lockfiles are reused between runs until a recipe they lock is exported again.
+    lockfile_dir = Path(args.lockfile_dir or top_dir/".lockfiles")
+    latest_revisions = lockfiles.get_latest_revisions(driver, log_file=log_dir/"latest-revisions.log")
+    for spec in tests:
+        spec['profile_hash'] = profile_hash
+        spec['lockfile'] = lockfiles.get_lockfile(lockfile_dir, spec['package_reference'])
+        spec['latest_revisions'] = latest_revisions
+        spec['refresh_lockfile'] = args.refresh_lockfiles
+    for spec, key in zip(tests, p.map(get_test_key, tests)):
+        spec.update(key)
+
+    # the timings and status of every job, written to test-output/results.{json,xml}
+    results = []
+
+    if not args.no_cache:
+        for spec in tests:
+            if spec.get('key') in result_cache:
+                sys.stdout.write(spec['package_reference']+": "+colors.PASS+"Pass (cached)\n"+colors.ENDC)
+                results.append({'name':spec['package_reference'], 'test':"test_package", 'status':"cached",
+                                'duration':spec.get('lock_time', 0.0), 'phases':{'graph':spec.get('lock_time', 0.0)}})
+        tests = [spec for spec in tests if spec.get('key') not in result_cache]
+
+    # start the most expensive jobs first, using the durations of previous runs when we have
+    # them and a static estimate when we don't.
+    history_db = Path(args.history_db or top_dir/".build-times.sqlite")
+    expected_prebuild = {}
+    expected_test = {}
+    if history_db.exists():
+        db = history.open_db(history_db)
+        expected_prebuild = history.get_expected_durations(db, "prebuild", profile_hash)
+        expected_test = history.get_expected_durations(db, "test_package", profile_hash)
+        db.close()
+
+    for spec in tests:
+        spec['cost'] = expected_test.get(spec['package_reference']) or estimate_cost(spec['name'], spec['requirements'])
+    tests = order_longest_first(tests, [spec['cost'] for spec in tests])
 
-          package_reference = name+"/"+version+"@"+args.user_channel_string
-          tests.append({'package_reference':package_reference,'test_folder':test_folder,'log_dir':log_dir})
+    # build the missing dependencies that are shared between tests once, in dependency order,
+    # before the tests start. otherwise every test that needs a missing binary builds it.
+    levels = []
+    conan_version = get_conan_version(driver)
+    if not args.no_prebuild and tests and conan_version and conan_version < matrix.MIN_CONAN_VERSION:
+        # each test builds the binaries it is missing instead
+        sys.stdout.write(f"WARNING: planning the builds needs conan {'.'.join(map(str, matrix.MIN_CONAN_VERSION))} or newer, found {'.'.join(map(str, conan_version))}. Skipping the prebuild step.\n")
+    elif not args.no_prebuild and tests:
+        sys.stdout.write("Planning builds...\n")
+        for level in plan_prebuild(tests):
+            costs = [expected_prebuild.get(item['ref'].split("#")[0]) or estimate_cost(item['ref'].split("/")[0]) for item in level]
+            levels.append((order_longest_first(level, costs), sorted(costs, reverse=True)))
 
+    makespan = sum(predict_makespan(costs, workers) for level, costs in levels)
+    makespan += predict_makespan([spec['cost'] for spec in tests], workers)
+    sys.stdout.write(f"Predicted run time: {makespan:.0f}s with {workers} workers\n")
 
-sys.stdout.write("Running tests...\n")
-with Pool(args.jobs) as p:
+    for level, costs in levels:
+        sys.stdout.write(f"Building {len(level)} missing binaries...\n")
+        for result in p.imap_unordered( run_prebuild, level ):
+            sys.stdout.write(result['binary']+": ")
+            if result['result'].returncode == 0:
+                sys.stdout.write(colors.PASS+"Built"+colors.ENDC+format_cache_stats(result['compiler_cache'])+"\n")
+            else:
+                sys.stdout.write(colors.FAIL+"Failed\n"+colors.ENDC)
+            results.append({'name':result['reference'], 'package_id':result['package_id'], 'test':"prebuild", 'status':"fail" if result['result'].returncode else "pass",
+                            'duration':result['duration'], 'phases':{'dependency_build':result['duration']}, 'log_file':result['log_file'],
+                            'compiler_cache':result['compiler_cache']})
+
+    sys.stdout.write("Running tests...\n")
     for result in p.imap_unordered( run_test, tests ):
         sys.stdout.write(result['package_reference']+": ")
         if result['result'].returncode == 0:
-            sys.stdout.write(colors.PASS+"Pass\n"+colors.ENDC)
+            sys.stdout.write(colors.PASS+"Pass"+colors.ENDC+format_cache_stats(result['compiler_cache'])+"\n")
+            if result['key']:
+                result_cache[result['key']] = {'package_reference':result['package_reference'], 'time':time.time()}
+                result_cache_file.write_text(json.dumps(result_cache, indent=2))
         else:
             sys.stdout.write(colors.FAIL+"Fail\n"+colors.ENDC)
+        results.append({'name':result['package_reference'], 'test':"test_package", 'status':"fail" if result['result'].returncode else "pass",
+                        'duration':sum(result['phases'].values()), 'phases':result['phases'], 'log_file':result['log_file'],
+                        'compiler_cache':result['compiler_cache']})
+
+if jobserver:
+    jobserver.close()
+
+if use_ccache:
+    sys.stdout.write(compiler_cache.show_stats())
+
+write_json(results, log_dir/"results.json")
+write_junit(results, log_dir/"results.xml")
+
+if not args.no_history:
+    git_commit = subprocess.run(['git','rev-parse','HEAD'], capture_output=True, text=True).stdout.strip() or None
+    db = history.open_db(args.history_db or top_dir/".build-times.sqlite")
+    history.record_results(db, results, git_commit=git_commit, profile_hash=profile_hash)
+    db.close()
 
 sys.stdout.write("Done\n")
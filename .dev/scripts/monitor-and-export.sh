@@ -1,5 +1,6 @@
 #! /bin/bash
 
-# Minitor all recipes for changes, and export them when a change is detected
+# Minitor all recipes for changes, and export them (and the recipes that depend on them) when a change is detected.
+# Extra arguments are passed to export-recipes.py, e.g. --user-channel-string rhd/devel
 
-fd conanfile.*.py | entr conan export /_ rhd/devel
+exec python3 "$(git rev-parse --show-toplevel)/export-recipes.py" --watch "$@"
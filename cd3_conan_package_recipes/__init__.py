@@ -0,0 +1,3 @@
+'''
+Utilities shared by the scripts used to export and test the recipes in this repository.
+'''
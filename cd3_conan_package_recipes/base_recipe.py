@@ -0,0 +1,34 @@
+'''
+Export the cd3-base python_requires that the legacy recipes in recipes-v1 extend.
+
+Conan resolves the python_requires of a recipe when it loads it, so cd3-base has to be
+in the cache before any recipe that extends it is exported or tested, and it has to be
+exported to the same user/channel as them. The recipes read that user/channel from the
+CD3_CONAN_USER_CHANNEL environment variable (cd3/devel if it is not set), which
+export_base_recipe sets for every conan command this process runs afterwards.
+
+cd3-base is a conan 1 recipe, so it is only exported when the driver runs conan 1. The
+recipes in recipes/ do not use it.
+'''
+from pathlib import Path
+import os
+
+from .conan_driver import get_conan_major_version
+
+USER_CHANNEL_ENV = "CD3_CONAN_USER_CHANNEL"
+BASE_REFERENCE = "cd3-base/0.1"
+BASE_RECIPE = Path(__file__).absolute().parent.parent/"recipes-v1"/"cd3-base"/"conanfile.py"
+
+
+def export_base_recipe(driver, user_channel_string, log_file=None):
+    '''
+    Export cd3-base to user_channel_string and make the legacy recipes use it. Returns
+    "exported", "skipped" if the driver does not run conan 1, or "failed".
+    '''
+    os.environ[USER_CHANNEL_ENV] = user_channel_string
+    if get_conan_major_version(driver) != 1:
+        return "skipped"
+    cmd = ['export', str(BASE_RECIPE), f"{BASE_REFERENCE}@{user_channel_string}"]
+    if driver.run(cmd, log_file=log_file).returncode:
+        return "failed"
+    return "exported"
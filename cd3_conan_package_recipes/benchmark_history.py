@@ -0,0 +1,108 @@
+'''
+A SQLite database of benchmark results, used as the baseline for later runs.
+
+Every benchmark of every run is stored with the reference and package_id of the binary it
+measured and the host it ran on. Results are only compared with earlier results for the same
+(reference, package_id, host), since anything else measures a different binary or machine.
+
+Benchmarks are noisy, so a fixed threshold either misses real regressions in stable
+benchmarks or flags noise in unstable ones. A benchmark has regressed if its median is worse
+than the baseline (the median of the previous runs) by more than the larger of a minimum
+threshold and a multiple of the noise, where the noise is the relative median absolute
+deviation of the previous runs or of the samples of the new run, whichever is larger.
+'''
+import statistics
+import sqlite3
+import json
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS benchmarks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    git_commit TEXT,
+    host TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    package_id TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    unit TEXT,
+    higher_is_better INTEGER NOT NULL,
+    median REAL NOT NULL,
+    samples TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS benchmarks_key ON benchmarks (reference, package_id, host, benchmark, time);
+'''
+
+
+def open_db(file):
+    db = sqlite3.connect(str(file))
+    db.executescript(SCHEMA)
+    return db
+
+
+def get_relative_mad(values):
+    '''
+    Return the median absolute deviation of values relative to their median.
+    '''
+    if len(values) < 2:
+        return 0.0
+    median = statistics.median(values)
+    if median == 0:
+        return 0.0
+    return statistics.median(abs(v - median) for v in values)/abs(median)
+
+
+def record_run(db, host, reference, package_id, benchmarks, statuses={}, git_commit=None):
+    '''
+    Append the benchmarks of a run (a dict of benchmarks by name, see benchmarks.load_run).
+    statuses maps benchmark names to a status other than "pass", e.g. "regressed". Only
+    passing results are used as baselines.
+    '''
+    now = time.time()
+    rows = []
+    for name, benchmark in benchmarks.items():
+        rows.append((now, git_commit, host, reference, package_id or "", name, benchmark.get('unit'),
+                     int(benchmark.get('higher_is_better', True)), statistics.median(benchmark['samples']),
+                     json.dumps(benchmark['samples']), statuses.get(name, "pass")))
+    with db:
+        db.executemany('''INSERT INTO benchmarks (time, git_commit, host, reference, package_id, benchmark, unit,
+                                                  higher_is_better, median, samples, status)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+
+
+def find_regressions(db, host, reference, package_id, benchmarks, threshold=0.10, noise_factor=3.0, window=5, min_history=3):
+    '''
+    Compare the benchmarks of a new run with the passing runs of the same (reference,
+    package_id, host) in the database. Returns a list of dicts for the benchmarks that are
+    worse than their baseline by more than max(threshold, noise_factor*noise), and a list of
+    the benchmarks that have no baseline yet.
+
+    The baseline is the median of the medians of the last `window` passing runs. Benchmarks
+    with fewer than `min_history` earlier runs are not checked.
+    '''
+    regressions = []
+    new = []
+    for name, benchmark in benchmarks.items():
+        rows = db.execute('''SELECT median FROM benchmarks
+                             WHERE reference = ? AND package_id = ? AND host = ? AND benchmark = ? AND status = 'pass'
+                             ORDER BY time DESC LIMIT ?''',
+                          (reference, package_id or "", host, name, window)).fetchall()
+        if len(rows) < min_history:
+            new.append(name)
+            continue
+        history = [r[0] for r in rows]
+        baseline = statistics.median(history)
+        value = statistics.median(benchmark['samples'])
+        if baseline == 0:
+            continue
+        change = value/baseline - 1
+        # a positive change is an improvement
+        if not benchmark.get('higher_is_better', True):
+            change = -change
+        noise = max(get_relative_mad(history), get_relative_mad(benchmark['samples']))
+        allowed = max(threshold, noise_factor*noise)
+        if change < -allowed:
+            regressions.append({'benchmark':name, 'value':value, 'baseline':baseline, 'unit':benchmark.get('unit'),
+                                'change':change, 'allowed':allowed, 'noise':noise})
+    return sorted(regressions, key=lambda r: r['change']), new
@@ -0,0 +1,170 @@
+'''
+Run the benchmark packages of the recipes and compare their results.
+
+A recipe can have a `bench_package` folder next to its `test_package`. It is a test
+package that times the library instead of just linking it. The benchmark is built in
+Release mode and writes its results as JSON to the file given in the
+`user.cd3:bench_output` conf:
+
+    {"benchmarks": [{"name": "parse", "unit": "items/s", "higher_is_better": true,
+                     "samples": [1.2e6, 1.3e6, ...]}]}
+
+with one sample per repetition. The number of repetitions is set with the
+`user.cd3:bench_repetitions` conf, and a command to run the benchmark with (e.g.
+`taskset -c 3` to pin it to a cpu) with the `user.cd3:bench_launcher` conf. A benchmark can add a "context" object with anything
+else that describes the run, e.g. properties of the library it detected at runtime.
+
+Each run is recorded with the package_id (and the options and settings) of the binary
+that was benchmarked, so results of different builds of the same reference can be told
+apart.
+'''
+from pathlib import Path
+import statistics
+import json
+
+from .conan_driver import get_file_name
+
+OUTPUT_CONF = "user.cd3:bench_output"
+REPETITIONS_CONF = "user.cd3:bench_repetitions"
+LAUNCHER_CONF = "user.cd3:bench_launcher"
+
+
+def get_bench_folder(recipe):
+    '''
+    Return the bench_package folder of a recipe, or None if it does not have one.
+    '''
+    folder = Path(recipe.folder)/"bench_package"
+    return folder if folder.is_dir() else None
+
+
+def run_benchmark(driver, bench_folder, reference, output_dir, conan_args=[], name=None, graph_json=True):
+    '''
+    Build and run a bench_package against reference. Returns the run (see load_run) and
+    the log file, or None and the log file if the benchmark failed.
+
+    The results and log are written to output_dir, in files named after the reference
+    unless a different name is given. The package that was benchmarked is read from the
+    JSON graph printed by `conan test`, which conan 1 can not do, so graph_json has to be
+    False for it.
+    '''
+    output_dir = Path(output_dir).absolute()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    name = get_file_name(name or reference)
+    output = output_dir/(name+".json")
+    output.unlink(missing_ok=True)
+    log_file = output_dir/(name+".log")
+    with open(log_file,'w') as f:
+        f.write(f"Running benchmark for {reference} using {bench_folder}\n")
+
+    cmd = ['test', str(bench_folder), reference, '--build', 'missing', '-s', 'build_type=Release',
+           '-c', f'tools.cmake.cmake_layout:test_folder={output_dir/(name+".build.d")}',
+           '-c', f'{OUTPUT_CONF}={output}'] + conan_args
+    if graph_json:
+        cmd += ['--format', 'json']
+    result = driver.run(cmd, log_file=log_file, capture_output=graph_json)
+    if result.returncode or not output.exists():
+        return None, log_file
+
+    run = json.loads(output.read_text())
+    run['package'] = get_package(json.loads(result.stdout), reference) if graph_json else None
+    output.write_text(json.dumps(run, indent=2))
+    if run['package']:
+        # keep the results of every binary of the reference that was benchmarked
+        package_dir = output_dir/"packages"/get_file_name(reference)
+        package_dir.mkdir(parents=True, exist_ok=True)
+        (package_dir/(run['package']['package_id']+".json")).write_text(json.dumps(run, indent=2))
+    return load_run(output), log_file
+
+
+def get_package(graph, reference):
+    '''
+    Return the reference, package_id, options and settings of the node for reference in
+    the JSON graph printed by conan 2.
+    '''
+    for node in graph['graph']['nodes'].values():
+        if (node.get('ref') or "").split("#")[0] == reference:
+            return {'reference':node['ref'], 'package_id':node.get('package_id'),
+                    'options':node.get('options') or {}, 'settings':node.get('settings') or {}}
+    return None
+
+
+def get_override_args(conan_major_version, override, profile_dir):
+    '''
+    Return the conan arguments that replace every requirement of the package named in the
+    reference override (e.g. "eigen/3.4.0") by that reference. Conan 1 has
+    --require-override, conan 2 replaces requirements with the [replace_requires] section
+    of a profile, which is written to profile_dir. The profile is composed with the other
+    profiles, so the default profile has to be given explicitly if no other one is.
+    '''
+    if conan_major_version == 1:
+        return ['--require-override', override]
+    name = override.split("/")[0]
+    profile = Path(profile_dir).absolute()/(get_file_name(override)+".profile")
+    profile.parent.mkdir(parents=True, exist_ok=True)
+    profile.write_text(f"[replace_requires]\n{name}/*: {override}\n")
+    return ['-pr', str(profile)]
+
+
+def load_run(file):
+    '''
+    Read the JSON of a benchmark run. Returns a dict with the benchmarks by name, the
+    context written by the benchmark, and the package that was benchmarked.
+    '''
+    run = json.loads(Path(file).read_text())
+    return {'benchmarks':{b['name']:b for b in run['benchmarks']},
+            'context':run.get('context', {}), 'package':run.get('package')}
+
+
+def summarize(benchmark):
+    '''
+    Return the median, min and max of the samples of a benchmark.
+    '''
+    samples = benchmark['samples']
+    return {'median':statistics.median(samples), 'min':min(samples), 'max':max(samples)}
+
+
+def get_change(baseline, benchmark):
+    '''
+    Return the relative change of the median of benchmark from the median of baseline. The
+    sign is flipped for metrics where lower is better, so a positive change is always an
+    improvement.
+    '''
+    base = summarize(baseline)['median']
+    value = summarize(benchmark)['median']
+    if base == 0:
+        return None
+    change = value/base - 1
+    return change if benchmark.get('higher_is_better', True) else -change
+
+
+def format_comparison(labels, results):
+    '''
+    Format the benchmarks of several runs of the same bench_package (e.g. one per version)
+    as a table with one row per benchmark and one column per run. Every column after the
+    first shows the change from the first.
+    '''
+    names = []
+    for result in results:
+        for name in result or {}:
+            if name not in names:
+                names.append(name)
+
+    rows = [["benchmark"] + list(labels)]
+    for name in names:
+        row = [name]
+        baseline = (results[0] or {}).get(name)
+        for result in results:
+            benchmark = (result or {}).get(name)
+            if benchmark is None:
+                row.append("-")
+                continue
+            cell = f"{summarize(benchmark)['median']:.4g} {benchmark.get('unit', '')}".strip()
+            if baseline is not None and benchmark is not baseline:
+                change = get_change(baseline, benchmark)
+                if change is not None:
+                    cell += f" ({100*change:+.1f}%)"
+            row.append(cell)
+        rows.append(row)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows) + "\n"
@@ -0,0 +1,67 @@
+'''
+A ccache directory shared by every build started by the harness.
+
+The recipes and test packages in this repository read the `user.cd3:compiler_launcher`
+conf and set `CMAKE_<LANG>_COMPILER_LAUNCHER` from it, so passing
+`-c user.cd3:compiler_launcher=ccache` runs every compile through ccache. The cache
+location and size limit are passed to ccache in the environment, which the conan
+commands (and the parallel workers) inherit.
+
+ccache can log the result of every compilation it handles to a stats log
+(CCACHE_STATSLOG). Each job gets its own log, so hit rates can be reported per reference
+even though all jobs share one cache.
+'''
+from pathlib import Path
+import subprocess
+import shutil
+import os
+
+CONF = "user.cd3:compiler_launcher"
+
+
+def setup_ccache(cache_dir, max_size="5G", base_dir=None, env=os.environ):
+    '''
+    Point ccache at cache_dir and limit it to max_size. Returns the conan arguments that
+    enable it, or None if ccache is not installed.
+
+    Builds in the conan cache and in test-output/ use different absolute paths for the
+    same sources, so paths below base_dir are rewritten to relative paths before they are
+    hashed.
+    '''
+    ccache = shutil.which("ccache")
+    if ccache is None:
+        return None
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    env['CCACHE_DIR'] = str(cache_dir)
+    env['CCACHE_MAXSIZE'] = str(max_size)
+    # do not hash the build directory into the debug info, it is different for every build.
+    env['CCACHE_NOHASHDIR'] = "1"
+    if base_dir:
+        env['CCACHE_BASEDIR'] = str(base_dir)
+    return ['-c', f'{CONF}={ccache}']
+
+
+def read_stats_log(file):
+    '''
+    Count the cache hits and misses recorded in a ccache stats log. Returns None if
+    nothing was compiled.
+
+    The log has a "# <source file>" line for each compilation followed by one line per
+    statistic it counted, e.g. "direct_cache_hit" or "cache_miss".
+    '''
+    try:
+        lines = Path(file).read_text().splitlines()
+    except OSError:
+        return None
+    hits = sum(1 for line in lines if line.endswith("_cache_hit"))
+    misses = sum(1 for line in lines if line == "cache_miss")
+    if hits + misses == 0:
+        return None
+    return {'hits':hits, 'misses':misses, 'hit_rate':hits/(hits+misses)}
+
+
+def show_stats():
+    '''
+    Return the summary of the whole cache printed by `ccache --show-stats`.
+    '''
+    return subprocess.run(['ccache', '--show-stats'], capture_output=True, text=True).stdout
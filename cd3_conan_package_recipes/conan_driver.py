@@ -0,0 +1,203 @@
+'''
+Run conan commands, either in a long-lived conan API instance or with the `conan` CLI.
+
+Every call to the `conan` CLI starts a new python interpreter, imports conan and loads
+the configuration and remotes again. The API driver does this once per process and then
+runs each command in-process, so a script that runs many commands only pays for it once.
+
+Commands are given as the argument list that would be passed to the `conan` executable,
+and a `subprocess.CompletedProcess` is returned in both cases so that scripts can switch
+between drivers without any other changes.
+'''
+import contextlib
+import io
+import json
+import subprocess
+import threading
+import sys
+import re
+
+BACKENDS = ["auto", "api", "cli"]
+
+
+class CliDriver:
+    '''
+    Run conan commands with the `conan` executable.
+    '''
+    name = "cli"
+
+    def run(self, args, log_file=None, capture_output=False, on_line=None):
+        cmd = ['conan'] + [str(a) for a in args]
+        stdout = subprocess.PIPE if capture_output else None
+        if log_file is None:
+            return subprocess.run(cmd, stdout=stdout, text=True)
+        with open(log_file, 'a') as f:
+            if on_line is None or capture_output:
+                return subprocess.run(cmd, stdout=stdout or f, stderr=f if capture_output else subprocess.STDOUT, text=True)
+            # stream the output so that on_line is called as each line is written
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True) as proc:
+                for line in proc.stdout:
+                    f.write(line)
+                    on_line(line)
+            return subprocess.CompletedProcess(cmd, proc.returncode)
+
+    def run_json(self, args, log_file=None):
+        return _parse_json(self.run(list(args) + ['--format', 'json'], log_file, capture_output=True))
+
+
+class ApiDriver:
+    '''
+    Run conan commands in-process with a single conan API instance.
+
+    The conan API is not thread safe, and output is captured by redirecting sys.stdout
+    and sys.stderr, so commands are run one at a time. Use one driver per process for
+    parallel jobs.
+    '''
+    name = "api"
+
+    def __init__(self):
+        from conan.api.conan_api import ConanAPI
+        from conan.cli.cli import Cli
+        self.conan_api = ConanAPI()
+        self.cli = Cli(self.conan_api)
+        self.cli.add_commands()
+        self.conan_api.command.cli = self.cli
+        self.lock = threading.Lock()
+
+    def run(self, args, log_file=None, capture_output=False, on_line=None):
+        args = [str(a) for a in args]
+        stdout = io.StringIO() if capture_output else None
+        with self.lock, contextlib.ExitStack() as stack:
+            if log_file is not None:
+                f = stack.enter_context(open(log_file, 'a'))
+                if on_line is not None:
+                    f = _LineWriter(f, on_line)
+                stack.enter_context(contextlib.redirect_stdout(f))
+                stack.enter_context(contextlib.redirect_stderr(f))
+            if stdout is not None:
+                stack.enter_context(contextlib.redirect_stdout(stdout))
+            try:
+                if not args or args[0] not in self.cli._commands:
+                    raise ValueError(f"Unknown command '{args[0] if args else ''}'")
+                # run the command the same way the CLI does, so that the output
+                # (including --format) is identical.
+                self.cli._commands[args[0]].run(self.conan_api, args[1:])
+                returncode = 0
+            except SystemExit as e:
+                # argparse exits on bad arguments
+                returncode = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                sys.stderr.write(f"ERROR: {e}\n")
+                returncode = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+        return subprocess.CompletedProcess(['conan'] + args, returncode, stdout.getvalue() if stdout else None)
+
+    def run_json(self, args, log_file=None):
+        return _parse_json(self.run(list(args) + ['--format', 'json'], log_file, capture_output=True))
+
+
+class _LineWriter(io.StringIO):
+    '''
+    A stream that writes to a file and calls on_line for each complete line.
+
+    Conan pipes the output of the commands it runs when the stream is a StringIO,
+    which is why this derives from it.
+    '''
+    def __init__(self, file, on_line):
+        super().__init__()
+        self.file = file
+        self.on_line = on_line
+        self.partial = ""
+
+    def write(self, text):
+        self.file.write(text)
+        lines = (self.partial + text).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            self.on_line(line+"\n")
+        return len(text)
+
+    def flush(self):
+        self.file.flush()
+
+
+def _parse_json(result):
+    '''
+    Return the parsed JSON output of a command, or None if the command failed.
+    '''
+    if result.returncode:
+        return None
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        return None
+
+
+def get_driver(backend="auto"):
+    '''
+    Return a driver for the requested backend. The "auto" backend uses the conan API
+    if conan can be imported, and falls back to the `conan` CLI if it can't.
+    '''
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown conan backend '{backend}'. Expected one of {', '.join(BACKENDS)}.")
+    if backend == "cli":
+        return CliDriver()
+    try:
+        return ApiDriver()
+    except ImportError as e:
+        if backend == "api":
+            raise
+        print(f"Could not import the conan API ({e}). Falling back to the conan CLI.")
+        return CliDriver()
+
+
+def get_conan_version(driver):
+    '''
+    Return the version of the conan that a driver runs commands with as a tuple, e.g.
+    (2, 8, 0), or None if it could not be determined. The API driver uses the conan it
+    imported, the CLI driver uses whatever `conan` is on the PATH, which may be conan 1 for
+    the legacy recipes.
+    '''
+    if driver.name == "api":
+        from conan import __version__ as output
+    else:
+        try:
+            output = subprocess.run(['conan', '--version'], capture_output=True, text=True).stdout
+        except OSError:
+            return None
+    match = re.search(r"(\d+)\.(\d+)(?:\.(\d+))?", output)
+    return tuple(int(v or 0) for v in match.groups()) if match else None
+
+
+def get_conan_major_version(driver):
+    '''
+    Return the major version of the conan that a driver runs commands with, or None if it
+    could not be determined.
+    '''
+    version = get_conan_version(driver)
+    return version[0] if version else None
+
+
+def split_user_channel(user_channel_string):
+    '''
+    Split a "user/channel" string into the --user/--channel arguments used by conan 2.
+    '''
+    user, _, channel = user_channel_string.partition("/")
+    args = []
+    if user:
+        args += ['--user', user]
+    if channel:
+        args += ['--channel', channel]
+    return args
+
+
+def get_file_name(name):
+    '''
+    Return name, e.g. a reference or the label of a run, with the characters that do not
+    belong in a file name replaced by "_".
+    '''
+    for char in [".","/","@",":","#"," ",",","*","="]:
+        name = name.replace(char,"_")
+    return name
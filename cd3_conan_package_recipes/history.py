@@ -0,0 +1,102 @@
+'''
+A SQLite database of how long each reference took to export, build and test.
+
+Every run of the harness appends one row per (reference, test, phase), along with the
+git commit, a hash of the conan profile and the number of CPUs on the host. Regressions
+are found by comparing the latest duration of each phase with the median of the runs
+before it.
+'''
+import statistics
+import sqlite3
+import time
+import os
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS durations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    git_commit TEXT,
+    profile_hash TEXT,
+    cpu_count INTEGER,
+    reference TEXT NOT NULL,
+    test TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS durations_key ON durations (reference, test, phase, profile_hash, time);
+'''
+
+
+def open_db(file):
+    db = sqlite3.connect(str(file))
+    db.executescript(SCHEMA)
+    return db
+
+
+def record_results(db, results, git_commit=None, profile_hash=None, cpu_count=None):
+    '''
+    Append the phase durations of a list of result dicts (see reporting.write_json).
+    Cached results are skipped, they did not take any time to build.
+    '''
+    now = time.time()
+    cpu_count = cpu_count or os.cpu_count()
+    rows = []
+    for result in results:
+        if result['status'] == "cached":
+            continue
+        for phase, duration in result.get('phases', {}).items():
+            rows.append((now, git_commit, profile_hash, cpu_count, result['name'], result.get('test', "test_package"),
+                         phase, duration, result['status']))
+    with db:
+        db.executemany('''INSERT INTO durations (time, git_commit, profile_hash, cpu_count, reference, test, phase, duration, status)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+
+
+def find_regressions(db, threshold=0.25, window=5, min_history=3, min_duration=1.0):
+    '''
+    Return a list of dicts describing the (reference, test, phase) combinations whose
+    latest passing duration is more than `threshold` (a fraction) slower than the median
+    of the `window` passing runs before it.
+
+    Only runs with the same profile hash and cpu count are compared. Combinations with
+    fewer than `min_history` earlier runs, or whose latest duration is less than
+    `min_duration` seconds, are ignored since they are dominated by noise.
+    '''
+    regressions = []
+    keys = db.execute('''SELECT DISTINCT reference, test, phase, profile_hash, cpu_count FROM durations
+                         WHERE status = 'pass' ''').fetchall()
+    for reference, test, phase, profile_hash, cpu_count in keys:
+        rows = db.execute('''SELECT duration, git_commit FROM durations
+                             WHERE reference = ? AND test = ? AND phase = ? AND profile_hash IS ? AND cpu_count IS ?
+                             AND status = 'pass'
+                             ORDER BY time DESC LIMIT ?''',
+                          (reference, test, phase, profile_hash, cpu_count, window+1)).fetchall()
+        if len(rows) < min_history+1:
+            continue
+        latest, commit = rows[0]
+        baseline = statistics.median(r[0] for r in rows[1:])
+        if latest < min_duration or baseline <= 0:
+            continue
+        change = latest/baseline - 1
+        if change > threshold:
+            regressions.append({'reference':reference, 'test':test, 'phase':phase, 'git_commit':commit,
+                                'duration':latest, 'baseline':baseline, 'change':change})
+    return sorted(regressions, key=lambda r: r['change'], reverse=True)
+
+
+def get_expected_durations(db, test, profile_hash=None, window=5):
+    '''
+    Return a dict mapping each reference to the median total duration of its last
+    `window` passing runs of the given test ("test_package", "prebuild", ...).
+    '''
+    totals = {}
+    rows = db.execute('''SELECT reference, SUM(duration) FROM durations
+                         WHERE test = ? AND status = 'pass' AND (? IS NULL OR profile_hash = ?)
+                         GROUP BY reference, time
+                         ORDER BY time DESC''', (test, profile_hash, profile_hash)).fetchall()
+    for reference, total in rows:
+        runs = totals.setdefault(reference, [])
+        if len(runs) < window:
+            runs.append(total)
+    return {reference:statistics.median(runs) for reference, runs in totals.items()}
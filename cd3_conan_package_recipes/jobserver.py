@@ -0,0 +1,83 @@
+'''
+A GNU make jobserver shared by every build started by the harness.
+
+Conan's CMake helper passes -j<cpu count> to every build, so running N builds at once
+runs N times as many compilers as there are cores. Instead, the harness owns a pool of
+build tokens and hands it to every make (and ninja >= 1.13) through MAKEFLAGS, the same
+way a top level `make -jN` shares its jobs with sub-makes. Each build starts with one
+implicit job and has to take a token from the pool for every job beyond that.
+
+The pool is a named pipe (`--jobserver-auth=fifo:PATH`) because conan closes inherited
+file descriptors when it runs a build, so the older anonymous pipe form can't reach make.
+The fifo form needs GNU make >= 4.4. With an older make, the budget is split evenly
+between the parallel jobs instead.
+'''
+from pathlib import Path
+import subprocess
+import tempfile
+import shutil
+import re
+import os
+
+
+def get_make_version(make="make"):
+    try:
+        output = subprocess.run([make, '--version'], capture_output=True, text=True).stdout
+    except OSError:
+        return None
+    match = re.search(r"GNU Make (\d+)\.(\d+)", output)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def supports_fifo_jobserver(make="make"):
+    version = get_make_version(make)
+    return version is not None and version >= (4, 4)
+
+
+class Jobserver:
+    '''
+    Create a fifo holding `tokens` build tokens. Use the instance as a context manager
+    to remove the fifo when done.
+    '''
+    def __init__(self, jobs, clients):
+        self.jobs = jobs
+        # every client (top level make) gets one implicit job, so only the rest go in the pool
+        self.tokens = max(jobs - clients, 0)
+        self.dir = Path(tempfile.mkdtemp(prefix="cd3-jobserver-"))
+        self.path = self.dir/"fifo"
+        os.mkfifo(self.path, 0o600)
+        # keep the fifo open for reading and writing so that it never sees EOF while
+        # clients come and go.
+        self.fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        os.write(self.fd, b"+"*self.tokens)
+
+    @property
+    def makeflags(self):
+        return f"-j{self.jobs} --jobserver-auth=fifo:{self.path}"
+
+    def close(self):
+        os.close(self.fd)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def setup_build_jobs(jobs, clients, env=os.environ):
+    '''
+    Limit the total number of build jobs run by `clients` parallel conan commands to `jobs`.
+
+    Returns a tuple of the Jobserver (or None if the budget is split instead) and the conan
+    arguments that must be passed to every command that may build something.
+    '''
+    if supports_fifo_jobserver():
+        jobserver = Jobserver(jobs, clients)
+        env['MAKEFLAGS'] = jobserver.makeflags
+        # tools.build:jobs=0 stops conan from passing -j to make, which would make it
+        # ignore the jobserver.
+        return jobserver, ['-c', 'tools.build:jobs=0']
+
+    return None, ['-c', f'tools.build:jobs={max(jobs // max(clients, 1), 1)}']
@@ -0,0 +1,132 @@
+'''
+Create, refresh and reuse a lockfile for each reference.
+
+Without a lockfile every conan command resolves the version ranges of a graph again,
+which can mean a query to the remotes for each range. The harness scripts create a
+lockfile per reference in one batch step (see lock_references), store them in a
+directory shared between runs, and pass them to the export, test and benchmark jobs,
+which then read the graph from the lockfile.
+
+A stored lockfile is reused as long as every recipe revision it locks is still the latest
+revision of that reference in the cache. When a recipe in this repository is exported
+again, the lockfiles that lock the old revision are created again, so a test never runs
+against a stale recipe. Use refresh to re-resolve the version ranges of every lockfile,
+e.g. to pick up new releases of the dependencies.
+
+The lockfiles are passed with --lockfile-partial, because test packages can add
+requirements of their own that are not in the lockfile of the reference.
+'''
+from pathlib import Path
+import json
+
+from .conan_driver import get_file_name
+
+
+def get_lockfile(lockfile_dir, reference):
+    '''
+    Return the path of the lockfile for reference in lockfile_dir.
+    '''
+    return Path(lockfile_dir).absolute()/(get_file_name(reference)+".lock")
+
+
+def get_lockfile_args(lockfile):
+    '''
+    Return the conan arguments that resolve a graph from lockfile, or no arguments if
+    there is no lockfile.
+    '''
+    if lockfile is None or not Path(lockfile).exists():
+        return []
+    return ['--lockfile', str(lockfile), '--lockfile-partial']
+
+
+def get_latest_revisions(driver, log_file=None):
+    '''
+    Return a dict with the latest recipe revision of every reference in the cache.
+    '''
+    listing = driver.run_json(['list', '*#latest'], log_file=log_file) or {}
+    revisions = {}
+    for reference, entry in listing.get("Local Cache", {}).items():
+        for revision in entry.get("revisions", {}):
+            revisions[reference] = revision
+    return revisions
+
+
+def get_locked_references(lockfile):
+    '''
+    Return (reference, revision) pairs for every recipe locked in lockfile.
+    '''
+    lock = json.loads(Path(lockfile).read_text())
+    locked = []
+    for section in ["requires", "build_requires", "python_requires"]:
+        for entry in lock.get(section, []):
+            reference, _, revision = entry.split("%")[0].partition("#")
+            locked.append((reference, revision))
+    return locked
+
+
+def is_current(lockfile, reference, latest_revisions):
+    '''
+    Return True if lockfile locks reference and every recipe it locks is at the latest
+    revision in the cache.
+    '''
+    try:
+        locked = get_locked_references(lockfile)
+    except (OSError, ValueError):
+        return False
+    if reference not in [r for r, revision in locked]:
+        return False
+    return all(latest_revisions.get(r) == revision for r, revision in locked)
+
+
+def lock_reference(driver, reference, lockfile, latest_revisions, conan_args=[], refresh=False, log_file=None):
+    '''
+    Create the lockfile for reference, unless it already exists and is current. Returns
+    "reused", "created" or "failed".
+    '''
+    if not refresh and is_current(lockfile, reference, latest_revisions):
+        return "reused"
+    Path(lockfile).parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(str(lockfile)+".tmp")
+    cmd = ['lock', 'create', '--requires', reference, '--lockfile-out', str(tmp)] + conan_args
+    if refresh:
+        # check the remotes for newer versions and revisions instead of using the cache
+        cmd += ['--update']
+    if driver.run(cmd, log_file=log_file).returncode:
+        tmp.unlink(missing_ok=True)
+        return "failed"
+    tmp.replace(lockfile)
+    return "created"
+
+
+def lock_references(driver, references, lockfile_dir, conan_args=[], refresh=False, log_dir=None):
+    '''
+    Create or refresh the lockfiles of several references in one step. Returns a dict
+    with the lockfile of each reference (None if it could not be locked), and a dict with
+    the status of each reference (see lock_reference).
+    '''
+    latest_revisions = get_latest_revisions(driver, log_file=Path(log_dir)/"latest-revisions.log" if log_dir else None)
+    lockfiles = {}
+    statuses = {}
+    for reference in references:
+        lockfile = get_lockfile(lockfile_dir, reference)
+        log_file = Path(log_dir)/(lockfile.stem+".lock.log") if log_dir else None
+        statuses[reference] = lock_reference(driver, reference, lockfile, latest_revisions, conan_args, refresh, log_file)
+        lockfiles[reference] = lockfile if statuses[reference] != "failed" else None
+    return lockfiles, statuses
+
+
+def merge_lockfiles(driver, lockfiles, lockfile_out, log_file=None):
+    '''
+    Merge several lockfiles into lockfile_out, e.g. to build the binaries needed by
+    several references with one lockfile. Returns lockfile_out, or None if there was
+    nothing to merge or the merge failed.
+    '''
+    lockfiles = [l for l in lockfiles if l is not None]
+    if not lockfiles:
+        return None
+    cmd = ['lock', 'merge', '--lockfile-out', str(lockfile_out)]
+    for lockfile in lockfiles:
+        cmd += ['--lockfile', str(lockfile)]
+    if driver.run(cmd, log_file=log_file).returncode:
+        return None
+    return lockfile_out
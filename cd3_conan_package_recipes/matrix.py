@@ -0,0 +1,74 @@
+'''
+Test references against a matrix of profiles, settings and options, building each
+distinct binary only once.
+
+Many combinations of the matrix resolve to the same binaries, e.g. a header-only package
+has the same package_id in Debug and Release, and every test variant of a reference
+needs the same binaries. The build order of every (reference, combination) is computed
+first, which only resolves the graph and computes package_ids. The binaries that have to
+be built are then merged by package reference (reference, revision and package_id), so
+that each one is built once, with the arguments of the first combination that needed it.
+
+`conan graph build-order --order-by configuration` and the format of its output need
+conan MIN_CONAN_VERSION or newer.
+'''
+import itertools
+
+MIN_CONAN_VERSION = (2, 2)
+
+
+def get_combinations(profiles=(), settings_variants=(), options_variants=()):
+    '''
+    Return a (label, conan arguments) pair for every combination of a profile, a set of
+    settings and a set of options. The settings and options variants are comma separated
+    lists, e.g. "build_type=Debug,compiler.cppstd=17" or "*:shared=True".
+    '''
+    axes = [[(p, ['-pr', p]) for p in profiles] or [("", [])],
+            [(s, [a for v in s.split(",") for a in ['-s', v]]) for s in settings_variants] or [("", [])],
+            [(o, [a for v in o.split(",") for a in ['-o', v]]) for o in options_variants] or [("", [])]]
+    combinations = []
+    for combination in itertools.product(*axes):
+        label = " ".join(label for label, args in combination if label) or "default"
+        combinations.append((label, [a for label, args in combination for a in args]))
+    return combinations
+
+
+def merge_build_orders(orders):
+    '''
+    Merge the build orders computed for several (reference, combination) pairs.
+
+    orders is a list of (combination label, combination args, build order) tuples, where
+    the build order is the JSON printed by `conan graph build-order --order-by
+    configuration`. Returns a list of levels of the distinct binaries that have to be
+    built. Each item is the item of the first build order that contained it, with the
+    label and arguments of its combination added as 'combination_label' and
+    'combination_args'. The binaries in a level only depend on binaries in earlier levels.
+    '''
+    items = {}
+    for label, args, order in orders:
+        for level in order['order']:
+            for item in level:
+                if item['binary'] == "Build" and item['pref'] not in items:
+                    items[item['pref']] = {**item, 'combination_label':label, 'combination_args':list(args)}
+
+    levels = []
+    done = set()
+    remaining = dict(items)
+    while remaining:
+        # dependencies that do not have to be built are already available
+        level = [item for item in remaining.values() if all(d in done or d not in items for d in item['depends'])]
+        if not level:
+            # a cycle can not happen in a valid graph, but do not loop forever if it does
+            level = list(remaining.values())
+        levels.append(level)
+        for item in level:
+            done.add(item['pref'])
+            del remaining[item['pref']]
+    return levels
+
+
+def get_binaries(order):
+    '''
+    Return the package references of every binary in a build order.
+    '''
+    return [item['pref'] for level in order['order'] for item in level]
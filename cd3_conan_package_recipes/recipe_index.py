@@ -0,0 +1,282 @@
+'''
+An index of the recipe references contained in a recipe directory.
+
+Two layouts are supported:
+
+- the conancenter layout, where `<root>/<name>/config.yml` lists the versions and the
+  folder that contains the recipe for each one.
+- our own custom layout, where `<root>/<name>/conanfile*.py` is a recipe that sets its
+  own `version = "..."`.
+
+Building the index parses every config.yml, conandata.yml and conanfile, so the result is
+cached in a JSON file along with the modification time and size of every file it was built
+from. As long as none of those files change, loading the index only costs a stat of each
+file.
+'''
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+import json
+import ast
+import os
+import re
+import sys
+
+CACHE_VERSION = 2
+
+# the ConanFile methods and attributes that declare a dependency on another recipe.
+REQUIRES_METHODS = {"requires", "build_requires", "tool_requires", "test_requires", "python_requires"}
+
+
+@dataclass
+class Recipe:
+    name: str
+    version: str | None
+    # the folder containing the recipe, and the conanfile itself.
+    folder: str
+    conanfile: str
+    # "config" for the conancenter layout, "custom" for our own layout.
+    layout: str
+    # the test_package folder and any _test_package/* variants.
+    test_folders: list[str] = field(default_factory=list)
+    # (kind, reference) pairs, where kind is the method or attribute that declared it.
+    requirements: list[tuple[str, str]] = field(default_factory=list)
+    # the recipe's entry in config.yml.
+    config: dict | None = None
+
+    @property
+    def reference(self):
+        return self.name+"/"+str(self.version) if self.version else self.conanfile
+
+
+def load_yaml(file):
+    if 'yaml' not in sys.modules:
+        try:
+            import yaml
+        except ImportError:
+            print(f"ERROR: could not import pyyaml which is required to parse {str(file)}.")
+            print(f"Please run `pip install pyyaml`")
+            sys.exit(1)
+    return sys.modules['yaml'].safe_load( Path(file).read_text() ) or {}
+
+
+def get_string_prefix(node):
+    '''
+    Return the constant start of a string expression and whether it is the whole string,
+    e.g. ("cd3-base/0.1@", False) for "cd3-base/0.1@" + os.environ.get(...). Returns
+    (None, False) if the expression does not start with a string literal.
+    '''
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value, True
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, complete = get_string_prefix(node.left)
+        if left is None or not complete:
+            return left, False
+        right, complete = get_string_prefix(node.right)
+        return left + (right or ""), complete
+    if isinstance(node, ast.JoinedStr):
+        prefix = ""
+        for value in node.values:
+            if not (isinstance(value, ast.Constant) and isinstance(value.value, str)):
+                return prefix or None, False
+            prefix += value.value
+        return prefix, True
+    return None, False
+
+
+def get_recipe_requirements(conanfile, conandata, version):
+    '''
+    Return the references required by a recipe, as (kind, reference) tuples.
+
+    Requirements are collected from string literals passed to self.requires(...) and friends,
+    from class attributes like `requires = "..."` and `python_requires = "..."`, and from the
+    `requirements` section of the recipe's conandata.yml. A reference that is built from a
+    literal and something else, e.g. `"cd3-base/0.1@" + user_channel` or an f-string, is
+    recorded with the literal part if that contains at least the name and the "/".
+    '''
+    requirements = []
+
+    def add(kind, node):
+        prefix, complete = get_string_prefix(node)
+        if prefix is not None and (complete or "/" in prefix):
+            requirements.append((kind, prefix))
+        elif isinstance(node, (ast.Tuple, ast.List)):
+            for elt in node.elts:
+                add(kind, elt)
+
+    try:
+        tree = ast.parse(Path(conanfile).read_text())
+    except (OSError, SyntaxError):
+        print(f"WARNING: could not parse {str(conanfile)}. Dependencies will be ignored.")
+        tree = ast.Module(body=[], type_ignores=[])
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in REQUIRES_METHODS:
+            if node.args:
+                add(node.func.attr, node.args[0])
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id in REQUIRES_METHODS:
+                    add(target.id, node.value)
+
+    for req in (conandata.get("requirements") or {}).get(version, None) or []:
+        requirements.append(("requires", req))
+
+    return requirements
+
+
+def get_test_folders(folder):
+    folder = Path(folder)
+    test_folders = sorted(str(d) for d in (folder/"_test_package").glob("*") if d.is_dir())
+    if (folder/"test_package").exists():
+        test_folders.append(str(folder/"test_package"))
+    return test_folders
+
+
+def build_index(root):
+    '''
+    Parse the recipes in the directory root and return a list of Recipe instances.
+    '''
+    root = Path(root)
+    recipes = []
+
+    for file in sorted(root.glob("*/config.yml")):
+        data = load_yaml(file)
+        root_dir = file.parent
+        name = root_dir.name
+        for version in data.get("versions",{}) or {}:
+            config = data["versions"][version] or {}
+            if not config.get('folder',None):
+                continue
+            version = str(version)
+            folder = root_dir/str(config['folder'])
+            conandata_file = folder/"conandata.yml"
+            conandata = load_yaml(conandata_file) if conandata_file.exists() else {}
+            recipes.append(Recipe(name=name,
+                                  version=version,
+                                  folder=str(folder),
+                                  conanfile=str(folder/"conanfile.py"),
+                                  layout="config",
+                                  test_folders=get_test_folders(folder),
+                                  requirements=get_recipe_requirements(folder/"conanfile.py", conandata, version),
+                                  config=config))
+
+    for file in sorted(root.glob("*/conanfile*.py")):
+        name = file.parent.name
+        match = re.search(r'''^\s*version\s*=\s*"([^"]*)"$''',file.read_text(),flags=re.MULTILINE)
+        version = match.group(1) if match else None
+        recipes.append(Recipe(name=name,
+                              version=version,
+                              folder=str(file.parent),
+                              conanfile=str(file),
+                              layout="custom",
+                              test_folders=get_test_folders(file.parent),
+                              requirements=get_recipe_requirements(file, {}, version)))
+
+    return recipes
+
+
+def get_signature(root):
+    '''
+    Return the names, modification times and sizes of every file an index of root could
+    depend on: everything two levels below root, and the _test_package variants.
+
+    Directories are recorded by name only, so that building a test package (which creates
+    a build folder inside test_package) does not invalidate the index.
+    '''
+    signature = []
+
+    def scan(dir, depth):
+        try:
+            entries = sorted(os.scandir(dir), key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir():
+                signature.append([entry.path])
+                if depth > 0 or entry.name == "_test_package":
+                    scan(entry.path, depth-1)
+            else:
+                st = entry.stat()
+                signature.append([entry.path, st.st_mtime_ns, st.st_size])
+
+    scan(str(root), 2)
+    return signature
+
+
+def load_index(root="recipes", cache_file=None):
+    '''
+    Return the index of the recipes in root, reusing the index stored in cache_file if none
+    of the files it was built from have changed.
+    '''
+    root = str(root)
+    signature = get_signature(root)
+
+    cache = {}
+    if cache_file is not None:
+        try:
+            cache = json.loads(Path(cache_file).read_text())
+        except (OSError, ValueError):
+            cache = {}
+        if cache.get("version") != CACHE_VERSION:
+            cache = {"version":CACHE_VERSION}
+
+        entry = cache.get(root, {})
+        if entry.get("signature") == signature:
+            return [Recipe(**{**r, 'requirements':[tuple(req) for req in r['requirements']]}) for r in entry["recipes"]]
+
+    recipes = build_index(root)
+
+    if cache_file is not None:
+        cache[root] = {"signature":signature, "recipes":[asdict(r) for r in recipes]}
+        tmp = Path(str(cache_file)+".tmp")
+        tmp.write_text(json.dumps(cache))
+        tmp.replace(cache_file)
+
+    return recipes
+
+
+def build_dependency_graph(recipes):
+    '''
+    Return a dict mapping each recipe reference to the set of references in the
+    index that it depends on.
+
+    A requirement that names an exact version in the index depends on that version only,
+    anything else (a version range, or a version that is not in the index) depends on
+    every version of that package in the index.
+    '''
+    by_name = {}
+    for recipe in recipes:
+        by_name.setdefault(recipe.name.lower(), []).append(recipe)
+
+    graph = {}
+    for recipe in recipes:
+        deps = set()
+        for kind, req in recipe.requirements:
+            req_name, _, req_version = req.split("@")[0].partition("/")
+            candidates = by_name.get(req_name.lower(), [])
+            exact = [c for c in candidates if c.version == req_version]
+            for dep in (exact or candidates):
+                if dep.reference != recipe.reference:
+                    deps.add(dep.reference)
+        graph[recipe.reference] = deps
+    return graph
+
+
+def get_dependents(graph, refs):
+    '''
+    Return the references in refs along with every reference that depends on
+    one of them, directly or indirectly.
+    '''
+    dependents = {}
+    for ref,deps in graph.items():
+        for dep in deps:
+            dependents.setdefault(dep, set()).add(ref)
+
+    result = set(refs)
+    stack = list(refs)
+    while stack:
+        for dependent in dependents.get(stack.pop(), []):
+            if dependent not in result:
+                result.add(dependent)
+                stack.append(dependent)
+    return result
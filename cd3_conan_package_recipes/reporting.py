@@ -0,0 +1,95 @@
+'''
+Time the phases of conan commands and write test results as JSON and JUnit XML.
+
+Conan prints a title when it starts each stage of a command, e.g.
+"======== Computing dependency graph ========". A PhaseTimer is fed the output of a
+command line by line and charges the time between titles to the phase the last title
+belongs to.
+'''
+from xml.etree import ElementTree
+import json
+import time
+
+# (title, phase) pairs. the titles are matched as substrings of each line of output.
+PHASE_MARKERS = [
+    ("Exporting recipe to the cache", "export"),
+    ("Computing dependency graph", "graph"),
+    ("Computing necessary packages", "graph"),
+    ("Installing packages", "dependency_build"),
+    ("Testing the package: Building", "build"),
+    ("Testing the package: Executing test", "test"),
+]
+
+PHASES = ["export", "graph", "dependency_build", "build", "test"]
+
+
+class PhaseTimer:
+    '''
+    Accumulate the wall time spent in each phase of one or more conan commands.
+    '''
+    def __init__(self, phase="graph"):
+        self.phases = {}
+        self.phase = phase
+        self.start = time.monotonic()
+
+    def switch(self, phase):
+        now = time.monotonic()
+        if self.phase is not None:
+            self.phases[self.phase] = self.phases.get(self.phase, 0.0) + now - self.start
+        self.phase = phase
+        self.start = now
+
+    def on_line(self, line):
+        if not line.startswith("========"):
+            return
+        for marker, phase in PHASE_MARKERS:
+            if marker in line:
+                self.switch(phase)
+                return
+
+    def stop(self):
+        self.switch(None)
+        return self.phases
+
+
+def write_json(results, file):
+    '''
+    Write a list of result dicts to file as JSON.
+
+    Each result has a name, a status ("pass", "fail" or "cached"), the total duration in
+    seconds, the time spent in each phase, and the log file the output went to. Jobs run
+    with ccache also have the number of compiler cache hits and misses.
+    '''
+    file.write_text(json.dumps({'created':time.time(), 'results':results}, indent=2, default=str))
+
+
+def write_junit(results, file, suite_name="conan-package-tests"):
+    '''
+    Write a list of result dicts to file as JUnit XML. Phase timings are stored as
+    properties of each testcase.
+    '''
+    suite = ElementTree.Element("testsuite",
+                                name=suite_name,
+                                tests=str(len(results)),
+                                failures=str(sum(1 for r in results if r['status'] == "fail")),
+                                skipped="0",
+                                time=f"{sum(r['duration'] for r in results):.3f}")
+    for result in results:
+        case = ElementTree.SubElement(suite, "testcase",
+                                      classname=result['name'],
+                                      name=result.get('test', "test_package"),
+                                      time=f"{result['duration']:.3f}")
+        properties = ElementTree.SubElement(case, "properties")
+        ElementTree.SubElement(properties, "property", name="cached", value=str(result['status'] == "cached").lower())
+        for phase, duration in result.get('phases', {}).items():
+            ElementTree.SubElement(properties, "property", name=f"phase.{phase}", value=f"{duration:.3f}")
+        for key, value in (result.get('compiler_cache') or {}).items():
+            ElementTree.SubElement(properties, "property", name=f"compiler_cache.{key}", value=str(value))
+        if result['status'] == "fail":
+            failure = ElementTree.SubElement(case, "failure", message=f"{result['name']} failed")
+            failure.text = f"See {result.get('log_file')} for details."
+
+    suites = ElementTree.Element("testsuites")
+    suites.append(suite)
+    ElementTree.indent(suites)
+    ElementTree.ElementTree(suites).write(file, encoding="unicode", xml_declaration=True)
@@ -0,0 +1,48 @@
+'''
+Order jobs by their expected cost so that a fixed size pool finishes as early as possible.
+
+Jobs are started longest first (the LPT rule), so the most expensive job does not end
+up starting last and stretching the whole run. The cost of a job is the median of its
+previous durations when there is any history, and a static estimate based on what it
+requires otherwise.
+'''
+import heapq
+
+# rough cost, in seconds, of a job that has to build or link against these packages.
+# these only matter until there is some history to go on.
+STATIC_COSTS = {
+    "boost": 600.0,
+    "hdf5": 300.0,
+    "eigen": 20.0,
+    "zlib": 10.0,
+}
+DEFAULT_COST = 30.0
+
+
+def estimate_cost(name, requirements=()):
+    '''
+    Return a static estimate of the cost of a job for package `name`, which depends
+    on the given references.
+    '''
+    cost = STATIC_COSTS.get(name.lower(), DEFAULT_COST)
+    for req in requirements:
+        cost += STATIC_COSTS.get(req.split("/")[0].lower(), 0.0)
+    return cost
+
+
+def order_longest_first(jobs, costs):
+    '''
+    Return the jobs sorted by decreasing cost. `costs` is a list parallel to `jobs`.
+    '''
+    return [job for cost, _, job in sorted(zip(costs, range(len(jobs)), jobs), key=lambda x: (-x[0], x[1]))]
+
+
+def predict_makespan(costs, workers):
+    '''
+    Return the time it takes `workers` workers to run jobs with the given costs, if
+    each job is started on the first worker to become free, in the given order.
+    '''
+    finish_times = [0.0]*max(workers, 1)
+    for cost in costs:
+        heapq.heappush(finish_times, heapq.heappop(finish_times) + cost)
+    return max(finish_times)
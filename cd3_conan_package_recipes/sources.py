@@ -0,0 +1,181 @@
+'''
+Prefetch the source archives declared in conandata.yml into a store that conan can use
+as its download cache.
+
+Conan looks up a file downloaded with a sha256 in `<download_cache>/s/<sha256>` before it
+goes to the network, so a store laid out the same way lets the recipes build without
+downloading anything. `core.*` confs can only be set in global.conf, so `configure_conan`
+adds a line that reads the store from the CD3_CONAN_SOURCE_CACHE environment variable
+(global.conf is a jinja template), and the harness sets that variable.
+
+Each file is hashed while it is downloaded and only moved into place if the checksum
+matches, so the store never contains a partial or corrupt file.
+'''
+from pathlib import Path
+import concurrent.futures
+import urllib.request
+import hashlib
+import shutil
+import time
+import os
+
+from .recipe_index import load_yaml
+
+# the folder conan keeps source backups in, inside the download cache.
+SOURCE_FOLDER = "s"
+
+SOURCE_CACHE_ENV = "CD3_CONAN_SOURCE_CACHE"
+# an empty value disables the download cache, so conan behaves as usual when the variable is not set.
+GLOBAL_CONF_LINE = f'''core.sources:download_cache={{{{ os.getenv("{SOURCE_CACHE_ENV}", "") }}}}'''
+
+
+def get_entries(roots):
+    '''
+    Yield a (reference, entry) pair for every source entry of every conandata.yml below the
+    recipe folders in roots.
+    '''
+    for root in roots:
+        # <name>/<folder>/conandata.yml for the conancenter layout and <name>/conandata.yml for ours
+        files = sorted(Path(root).glob("*/*/conandata.yml")) + sorted(Path(root).glob("*/conandata.yml"))
+        for file in files:
+            name = file.relative_to(root).parts[0]
+            for version, entries in (load_yaml(file).get("sources") or {}).items():
+                # an entry is a dict with url(s) and sha256, or a list of them
+                # when a version is made of several archives.
+                if isinstance(entries, dict):
+                    entries = [entries]
+                for entry in entries:
+                    yield f"{name}/{version}", entry
+
+
+def get_sources(roots):
+    '''
+    Return a list of dicts, one per distinct sha256, with the urls of a source archive and
+    the references that use it. Every conandata.yml below the recipe folders in roots is read.
+    '''
+    sources = {}
+    for reference, entry in get_entries(roots):
+        if not entry.get("sha256"):
+            continue
+        urls = entry["url"] if isinstance(entry["url"], list) else [entry["url"]]
+        source = sources.setdefault(entry["sha256"], {'sha256':entry["sha256"], 'urls':[], 'references':[]})
+        source['urls'] += [url for url in urls if url not in source['urls']]
+        if reference not in source['references']:
+            source['references'].append(reference)
+    return list(sources.values())
+
+
+def get_unverified_sources(roots):
+    '''
+    Return (reference, reason) pairs for the source entries that have no sha256, e.g. a
+    git fetch or an archive that has not been checksummed yet. These are downloaded without
+    verification on every build and can not be stored.
+    '''
+    unverified = []
+    for reference, entry in get_entries(roots):
+        if entry.get("sha256"):
+            continue
+        if entry.get("url"):
+            unverified.append((reference, "url without sha256"))
+        elif entry.get("git"):
+            unverified.append((reference, f"git fetch of {entry.get('ref')}"))
+        else:
+            unverified.append((reference, "no url"))
+    return unverified
+
+
+def get_source_path(store, sha256):
+    return Path(store)/SOURCE_FOLDER/sha256
+
+
+def download(url, file, timeout=60):
+    '''
+    Download url to file and return its sha256 and size, computed while it is written.
+    file may be None to only compute the checksum.
+    '''
+    h = hashlib.sha256()
+    size = 0
+    with urllib.request.urlopen(url, timeout=timeout) as response, open(file or os.devnull, 'wb') as f:
+        while chunk := response.read(1 << 16):
+            h.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def fetch(source, store, timeout=60, retries=2):
+    '''
+    Download a source into the store unless it is already there.
+
+    Returns a dict with the sha256, the status ("present", "downloaded" or "failed"),
+    the number of bytes downloaded and a list of errors.
+    '''
+    path = get_source_path(store, source['sha256'])
+    if path.exists():
+        return {'sha256':source['sha256'], 'status':"present", 'size':0, 'errors':[]}
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    errors = []
+    for attempt in range(retries+1):
+        for url in source['urls']:
+            try:
+                sha256, size = download(url, tmp, timeout)
+            except OSError as e:
+                errors.append(f"{url}: {e}")
+                continue
+            if sha256 != source['sha256']:
+                errors.append(f"{url}: sha256 mismatch, expected {source['sha256']} but got {sha256}")
+                continue
+            tmp.replace(path)
+            return {'sha256':source['sha256'], 'status':"downloaded", 'size':size, 'errors':errors}
+        if attempt < retries:
+            time.sleep(2**attempt)
+
+    tmp.unlink(missing_ok=True)
+    return {'sha256':source['sha256'], 'status':"failed", 'size':0, 'errors':errors}
+
+
+def prefetch(sources, store, jobs=8, timeout=60, retries=2):
+    '''
+    Fetch all sources into the store concurrently. Yields the result of each fetch (see
+    fetch) as it finishes, with the source's references added.
+    '''
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(fetch, source, store, timeout, retries):source for source in sources}
+        for future in concurrent.futures.as_completed(futures):
+            yield {**future.result(), 'references':futures[future]['references']}
+
+
+def clean(sources, store):
+    '''
+    Remove the files in the store that are not used by any of sources. Returns the removed paths.
+    '''
+    keep = {source['sha256'] for source in sources}
+    removed = []
+    for path in (Path(store)/SOURCE_FOLDER).glob("*"):
+        # conan writes a <sha256>.json summary next to each file it uses.
+        if path.name.split(".")[0] not in keep:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+            removed.append(path)
+    return removed
+
+
+def configure_conan(conan_home):
+    '''
+    Add the download cache line to the global.conf in conan_home, unless it is already there.
+    Returns True if the file was changed.
+    '''
+    file = Path(conan_home)/"global.conf"
+    text = file.read_text() if file.exists() else ""
+    if GLOBAL_CONF_LINE in text:
+        return False
+    if "core.sources:download_cache" in text:
+        raise RuntimeError(f"{file} already sets core.sources:download_cache. Replace it with '{GLOBAL_CONF_LINE}' to use the source store.")
+    if text and not text.endswith("\n"):
+        text += "\n"
+    file.write_text(text + GLOBAL_CONF_LINE + "\n")
+    return True
@@ -1,10 +1,20 @@
 from pathlib import Path
-import subprocess
 import os
 import sys
+import json
+import hashlib
 import pathlib
+import subprocess
+import time
+import concurrent.futures
 from argparse import ArgumentParser
 
+from cd3_conan_package_recipes.conan_driver import BACKENDS, get_driver, split_user_channel
+from cd3_conan_package_recipes.recipe_index import load_index, build_dependency_graph, get_dependents
+from cd3_conan_package_recipes import history
+from cd3_conan_package_recipes import lockfiles
+from cd3_conan_package_recipes import base_recipe
+
 parser = ArgumentParser(description="Export the conan package references contained in this repository.")
 
 parser.add_argument("name",
@@ -15,6 +25,54 @@ parser.add_argument("--user-channel-string",
                     action="store",
                     default="cd3/devel",
                     help="Specify the user/channel string to export packages too.",)
+parser.add_argument("--jobs",
+                    action="store",
+                    type=int,
+                    default=1,
+                    help="Export independent recipes in parallel using this many workers.",)
+parser.add_argument("--backend",
+                    action="store",
+                    choices=BACKENDS,
+                    default="auto",
+                    help="Run conan commands in-process with the conan API, or with the conan CLI. 'auto' uses the API if it is available.",)
+parser.add_argument("--force",
+                    action="store_true",
+                    help="Export all references, even if they have not changed since they were last exported.",)
+parser.add_argument("--state-file",
+                    action="store",
+                    default=".export-state.json",
+                    help="File used to store the digest of each exported reference.",)
+parser.add_argument("--index-cache",
+                    action="store",
+                    default=".recipe-index-cache.json",
+                    help="File used to cache the recipe index between runs.",)
+parser.add_argument("--history-db",
+                    action="store",
+                    default=".build-times.sqlite",
+                    help="SQLite database the duration of each export is appended to.",)
+parser.add_argument("--no-history",
+                    action="store_true",
+                    help="Do not record the duration of each export.",)
+parser.add_argument("--lockfile-dir",
+                    action="store",
+                    default=".lockfiles",
+                    help="Directory of the lockfiles written by the test and benchmark scripts. A reference is exported with its lockfile if it has one, so its python_requires are not resolved again.",)
+parser.add_argument("--watch",
+                    action="store_true",
+                    help="Keep running and export recipes (and the recipes that depend on them) when they change.",)
+parser.add_argument("--debounce",
+                    action="store",
+                    type=float,
+                    default=0.5,
+                    help="When watching, wait until no file has changed for this many seconds before exporting.",)
+parser.add_argument("--poll",
+                    action="store_true",
+                    help="When watching, poll for changes instead of using inotify.",)
+parser.add_argument("--poll-interval",
+                    action="store",
+                    type=float,
+                    default=1.0,
+                    help="Number of seconds between checks for changes when polling.",)
 
 
 args = parser.parse_args()
@@ -22,42 +80,311 @@ args = parser.parse_args()
 os.chdir( pathlib.Path(__file__).parent )
 
 
-export_cmd = ['conan','export']
+export_cmd = ['export']
+
+# directories in a recipe folder that are not part of the exported recipe.
+IGNORED_DIRS = {"test_package", "_test_package", "bench_package", "build", "__pycache__"}
+
+
+def get_export_cmd(recipe):
+    if recipe.layout == "config":
+        return export_cmd + [recipe.folder, '--name', recipe.name, '--version', recipe.version] + split_user_channel(args.user_channel_string)
+    return export_cmd + [recipe.conanfile] + split_user_channel(args.user_channel_string)
+
+
+def get_recipe_digest(recipe):
+    '''
+    Return a digest of everything that goes into exporting a recipe: the files in the
+    recipe folder (including conandata.yml), its config.yml entry and the export command.
+    '''
+    h = hashlib.sha256()
+    h.update(json.dumps([get_export_cmd(recipe), recipe.config], sort_keys=True, default=str).encode())
+    for source in [recipe.folder]:
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS)
+            for file in sorted(files):
+                path = Path(root)/file
+                h.update(str(path.relative_to(source)).encode())
+                h.update(b"\0")
+                h.update(path.read_bytes())
+                h.update(b"\0")
+    return h.hexdigest()
+
+
+def load_state(file):
+    try:
+        return json.loads(Path(file).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(file, state):
+    tmp = Path(str(file)+".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+    tmp.replace(file)
+
+
+# created when the first recipe has to be exported, so a run where nothing changed does
+# not load conan at all.
+driver = None
+
+def get_export_driver(jobs):
+    global driver
+    if driver is None:
+        backend = args.backend
+        if jobs > 1 and backend != "cli":
+            # the API driver runs one command at a time for the whole process, which would
+            # serialize the workers. the CLI driver runs each export in its own process.
+            if backend == "api":
+                print("The conan API can only run one export at a time. Using the conan CLI for parallel exports.")
+            backend = "cli"
+        driver = get_driver(backend)
+    return driver
+
+
+def export_recipe(recipe):
+    # the lockfile is not part of get_export_cmd, it does not change what is exported.
+    cmd = get_export_cmd(recipe) + lockfiles.get_lockfile_args(lockfiles.get_lockfile(args.lockfile_dir, recipe.reference+"@"+args.user_channel_string))
+    print(f"Exporting {recipe.reference} with command 'conan {' '.join(cmd)}'.")
+    start = time.monotonic()
+    result = driver.run(cmd)
+    result.duration = time.monotonic() - start
+    return result
+
+
+def export_recipes(recipes, graph, jobs, results=None):
+    '''
+    Export recipes with a pool of workers. A recipe is only submitted once every
+    recipe it depends on has been exported, so python_requires providers are
+    always available to the recipes that use them.
+
+    If results is a list, a result dict with the duration of each export is appended to it.
+    '''
+    pending = {r.reference:r for r in recipes}
+    # only wait on dependencies that are actually being exported in this run.
+    waiting_on = {ref:set(d for d in graph[ref] if d in pending) for ref in pending}
+    dependents = {ref:set() for ref in pending}
+    for ref,deps in waiting_on.items():
+        for dep in deps:
+            dependents[dep].add(ref)
+
+    failed = []
+    if pending:
+        get_export_driver(jobs)
+        # the legacy recipes load their python_requires from the cache, so it has to be
+        # exported to the same user/channel before them.
+        if base_recipe.export_base_recipe(driver, args.user_channel_string) == "failed":
+            print(f"ERROR: could not export {base_recipe.BASE_REFERENCE}@{args.user_channel_string}.")
+            failed.append(base_recipe.BASE_REFERENCE)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(jobs,1)) as executor:
+        running = {}
 
-# this loop will export recipes that follow the conancenter convention
-# on layout.
-for file in Path("recipes").glob("*/config.yml"):
-    if 'yaml' not in sys.modules:
+        def submit_ready():
+            for ref in [ref for ref in pending if len(waiting_on[ref]) == 0]:
+                running[executor.submit(export_recipe, pending.pop(ref))] = ref
+
+        submit_ready()
+        while running:
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                ref = running.pop(future)
+                result = future.result()
+                if result.returncode:
+                    failed.append(ref)
+                if results is not None:
+                    results.append({'name':ref+"@"+args.user_channel_string, 'test':"export", 'status':"fail" if result.returncode else "pass",
+                                    'duration':result.duration, 'phases':{'export':result.duration}})
+                for dependent in dependents[ref]:
+                    waiting_on[dependent].discard(ref)
+            submit_ready()
+
+    if pending:
+        print(f"ERROR: could not export {', '.join(sorted(pending))}. There is a dependency cycle between these recipes.")
+        failed += sorted(pending)
+
+    return failed
+
+
+def run_export(force=False, with_dependents=False, verbose=True):
+    '''
+    Export the references that have changed since they were last exported and
+    return the list of references that failed.
+
+    If with_dependents is True, the references that depend on a changed reference
+    are exported too.
+    '''
+    recipes = load_index("recipes", args.index_cache)
+    graph = build_dependency_graph(recipes)
+
+    state = load_state(args.state_file)
+    state_keys = {r.reference:r.reference+"@"+args.user_channel_string for r in recipes}
+    digests = {r.reference:get_recipe_digest(r) for r in recipes}
+
+    selected = [r for r in recipes if len(args.name) == 0 or (r.name in args.name)]
+    if force:
+        changed = set(r.reference for r in selected)
+    else:
+        changed = set(r.reference for r in selected if state.get(state_keys[r.reference]) != digests[r.reference])
+    if with_dependents:
+        changed = get_dependents(graph, changed)
+
+    if verbose:
+        for recipe in selected:
+            if recipe.reference not in changed:
+                print(f"Skipping {recipe.reference}, it has not changed since it was last exported.")
+
+    recipes = [r for r in recipes if r.reference in changed]
+    results = []
+    failed = export_recipes(recipes, graph, args.jobs, results)
+
+    if results and not args.no_history:
+        git_commit = subprocess.run(['git','rev-parse','HEAD'], capture_output=True, text=True).stdout.strip() or None
+        db = history.open_db(args.history_db)
+        history.record_results(db, results, git_commit=git_commit)
+        db.close()
+
+    for recipe in recipes:
+        if recipe.reference in failed:
+            state.pop(state_keys[recipe.reference], None)
+        else:
+            state[state_keys[recipe.reference]] = digests[recipe.reference]
+    if recipes:
+        save_state(args.state_file, state)
+
+    for ref in failed:
+        print(f"FAIL: {ref}")
+
+    return failed
+
+
+class InotifyWatcher:
+    '''
+    Wait for changes to the files in a directory tree using the Linux inotify API.
+    '''
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        self.add_tree(Path(root))
+
+    def add_tree(self, root):
+        for dir, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir), self.EVENT_MASK)
+            if wd >= 0:
+                self.dirs[wd] = Path(dir)
+
+    def wait(self, timeout=None):
+        '''
+        Block until a file changes and return True, or return False if nothing
+        changed within timeout seconds.
+        '''
+        import select
+        import struct
+        changed = False
+        while not changed:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return False
+            data = os.read(self.fd, 64*1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset+16:offset+16+length].rstrip(b"\0")
+                offset += 16 + length
+                if mask & self.IN_Q_OVERFLOW:
+                    changed = True
+                    continue
+                if wd not in self.dirs or os.fsdecode(name) in IGNORED_DIRS:
+                    continue
+                changed = True
+                # start watching directories that are created (or moved) into the tree
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self.add_tree(self.dirs[wd]/os.fsdecode(name))
+        return True
+
+
+class PollingWatcher:
+    '''
+    Wait for changes to the files in a directory tree by polling their modification
+    times. Used when inotify is not available.
+    '''
+    def __init__(self, root, interval=1.0):
+        self.root = Path(root)
+        self.interval = interval
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        snapshot = {}
+        for dir, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+            for file in files:
+                try:
+                    st = os.stat(os.path.join(dir, file))
+                except OSError:
+                    continue
+                snapshot[os.path.join(dir, file)] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        start = time.monotonic()
+        while True:
+            snapshot = self.take_snapshot()
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                return True
+            if timeout is not None and time.monotonic() - start >= timeout:
+                return False
+            time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+
+
+def watch():
+    '''
+    Export recipes whenever they change.
+
+    A burst of file changes is collected until no change has been seen for
+    --debounce seconds. Then the references that changed are exported, along with
+    all the references that depend on them.
+    '''
+    watcher = None
+    if not args.poll:
         try:
-            print("Importing `yaml` module to parse yaml config files.")
-            import yaml
-        except:
-            print(f"ERROR: could not import pyyaml which is required to parse {str(file)}.")
-            print(f"Please run `pip install pyyaml`")
-            sys.exit(1)
-
-    data = yaml.safe_load( file.read_text() )
-    root_dir = file.parent
-    name = root_dir.stem
-    if len(args.name) == 0 or (name in args.name):
-        for version in data.get("versions",{}):
-            folder = data["versions"][version].get('folder',None)
-            if folder:
-                cmd = export_cmd + [str(root_dir/folder), name+"/"+version+"@"+args.user_channel_string]
-                print(f"Exporting {name} version {version} with command '{' '.join(cmd)}'.")
-                result = subprocess.run(cmd)
-
-
-# this loop will export recpipes that follow our own custom convention
-# on layout. We need to make sure the rhd_custom_generators recipes get exported first
-# since the packages that use them will need then when they get exported
-conanfiles = sorted(Path("recipes").glob("*/conanfile*.py"), key = lambda x : "rhd_custom_generators" in str(x), reverse=True)
-for file in  conanfiles:
-  name = file.parent.stem
-  if len(args.name) == 0 or (name in args.name):
-      cmd = export_cmd + [str(file)]
-      cmd = cmd + [args.user_channel_string]
-
-      print(f"Exporting {str(file)} with command '{' '.join(cmd)}'.")
-      subprocess.run(cmd)
+            watcher = InotifyWatcher("recipes")
+        except (OSError, AttributeError) as e:
+            print(f"Could not use inotify to watch for changes ({e}). Falling back to polling.")
+    if watcher is None:
+        watcher = PollingWatcher("recipes", args.poll_interval)
+
+    print("Watching for changes to recipes. Press Ctrl-C to stop.")
+    while True:
+        watcher.wait()
+        while watcher.wait(args.debounce):
+            pass
+        run_export(with_dependents=True, verbose=False)
+
+
+if args.watch:
+    run_export(force=args.force)
+    try:
+        watch()
+    except KeyboardInterrupt:
+        sys.exit(0)
 
+failed = run_export(force=args.force)
+sys.exit(1 if failed else 0)
@@ -3,9 +3,7 @@ import os, glob
 
 class ConanPackage(ConanFile):
     name = 'UnitConvert' # Note: this line was modified to make sure this setting is static.
-    git_url_basename = 'https://github.com/CD3/' # Note: this line was modified to make sure this setting is static.
     version = '0.5.2' # Note: this line was modified to make sure this setting is static.
-    checkout = '0.5.2' # Note: this line was modified to make sure this setting is static.
     url = "https://github.com/CD3/cd3-conan-packages"
 
     author = "CD Clark III clifton.clark@gmail.com"
@@ -18,8 +16,12 @@ class ConanPackage(ConanFile):
     settings = "os", "compiler", "build_type", "arch"
 
     def source(self):
-        self.run(f"git clone {self.git_url_basename}/{self.name}")
-        self.run(f"cd {self.name} && git checkout {self.checkout} && git log -1")
+        source = self.conan_data["sources"][self.version]
+        if "sha256" in source:
+          tools.get(**source, destination=self.name, strip_root=True)
+        else:
+          # there is no release archive, so only fetch the tagged commit
+          self.run(f"git clone --depth 1 --branch {source['ref']} {source['git']} {self.name}")
 
     def build(self):
         cmake = CMake(self)
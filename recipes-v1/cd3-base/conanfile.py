@@ -0,0 +1,110 @@
+from conans import ConanFile, CMake, tools
+import functools
+import subprocess
+import os
+import re
+
+
+@functools.lru_cache(maxsize=None)
+def get_cmake_version(cmake):
+    '''
+    Return the version reported by the cmake executable at path `cmake`, or None if it
+    could not be run. The result is cached, so each cmake binary is only run once per process
+    no matter how many recipes are loaded.
+    '''
+    try:
+        output = subprocess.run([cmake, "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    except OSError:
+        return None
+    version = re.search( r"cmake version (?P<version>\S*)", output)
+    return version.group("version") if version else None
+
+
+def header_only_cmakelists(text):
+    '''
+    Return the text of a CMakeLists.txt for a header-only library with the languages of
+    the project() call set to NONE, so that it can be configured and installed without a
+    compiler. The generated headers, export targets and config files are the same, except
+    for the pointer size recorded in the package version file, which is not known without a
+    compiler. The check that uses it is disabled with ARCH_INDEPENDENT, as it should be for a
+    header-only library.
+    '''
+    def no_languages(match):
+        args = match.group(2)
+        if not re.search(r"\b(VERSION|DESCRIPTION|HOMEPAGE_URL|LANGUAGES)\b", args):
+            # project(<name> [<language>...]), everything after the name is a language
+            return f"{match.group(1)}{args.split()[0]} LANGUAGES NONE)"
+        # the languages run up to the next keyword or the end of the call
+        args, count = re.subn(r"\bLANGUAGES\s.*?(\s*)(?=\b(?:VERSION|DESCRIPTION|HOMEPAGE_URL)\b|$)", r"LANGUAGES NONE\1", args, count=1, flags=re.DOTALL)
+        if not count:
+            args = args.rstrip() + " LANGUAGES NONE"
+        return f"{match.group(1)}{args})"
+    text = re.sub(r"^(\s*project\s*\(\s*)([^)]*)\)", no_languages, text, count=1, flags=re.MULTILINE | re.IGNORECASE)
+    if "ARCH_INDEPENDENT" not in text:
+        text = text.replace("COMPATIBILITY SameMajorVersion", "COMPATIBILITY SameMajorVersion\nARCH_INDEPENDENT")
+    return text
+
+
+class CD3Base(object):
+    '''
+    Common steps of the legacy CD3 recipes. Use it with
+
+        python_requires = "cd3-base/0.1@" + os.environ.get("CD3_CONAN_USER_CHANNEL", "cd3/devel")
+        python_requires_extend = "cd3-base.CD3Base"
+
+    and override the `_patch_sources` and `_cmake_definitions` hooks as needed. The
+    harness scripts export cd3-base to their --user-channel-string first and set
+    CD3_CONAN_USER_CHANNEL to it.
+    '''
+    # we need a recent version of cmake to build. if the cmake on the PATH is
+    # older than cmake_min_version, cmake_req_version is added to the build_requires.
+    cmake_min_version = "3.14.0"
+    cmake_req_version = "3.16.0"
+
+    @property
+    def _source_subfolder(self):
+        return self.name
+
+    def build_requirements(self):
+        cmake = tools.which("cmake")
+        version = get_cmake_version(os.path.realpath(cmake)) if cmake else None
+        if version is None or tools.Version(version) < self.cmake_min_version:
+          self.build_requires(f"cmake_installer/{self.cmake_req_version}@conan/stable")
+
+    def source(self):
+        source = self.conan_data["sources"][self.version]
+        if "sha256" in source:
+          tools.get(**source, destination=self._source_subfolder, strip_root=True)
+        else:
+          # there is no release archive, so only fetch the tagged commit
+          self.run(f"git clone --depth 1 --branch {source['ref']} {source['git']} {self._source_subfolder}")
+        self._patch_sources()
+
+    def _patch_sources(self):
+        pass
+
+    def _cmake_definitions(self):
+        return {}
+
+    def _configure_cmake(self):
+        cmake = CMake(self)
+        cmake.configure(source_folder=self._source_subfolder, defs=self._cmake_definitions())
+        return cmake
+
+    def build(self):
+        cmake = self._configure_cmake()
+        cmake.build()
+
+    def package(self):
+        cmake = CMake(self)
+        cmake.install()
+
+
+class ConanPackage(ConanFile):
+    name = "cd3-base"
+    version = "0.1"
+    url = "https://github.com/CD3/cd3-conan-packages"
+
+    author = "CD Clark III clifton.clark@gmail.com"
+    description = "Base class for the legacy CD3 recipes."
+    license = "MIT"
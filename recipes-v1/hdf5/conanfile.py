@@ -1,10 +1,6 @@
-from conans import ConanFile, CMake, tools
+from conans import ConanFile, tools
 import os
-import platform
 import pathlib
-import glob
-import io
-import re
 
 class ConanPackage(ConanFile):
     name = "hdf5"
@@ -16,38 +12,25 @@ class ConanPackage(ConanFile):
     settings = "os", "compiler", "build_type", "arch"
 
     requires = "zlib/1.2.11"
+    python_requires = "cd3-base/0.1@" + os.environ.get("CD3_CONAN_USER_CHANNEL", "cd3/devel")
+    python_requires_extend = "cd3-base.CD3Base"
 
     options = {
         "cxx": [True,False],
+        "hl": [True,False],
+        "tools": [True,False],
         "shared": [True,False],
         "parallel": [True,False],
         }
     default_options = (
         "cxx=True",
+        "hl=True",
+        "tools=True",
         "shared=False",
         "parallel=False",
         "zlib:shared=False"
     )
 
-    def build_requirements(self):
-        # we need a recent version of cmake to build. check if it is installed,
-        # and add it to the build_requires if not
-        cmake_min_version = "3.14.0"
-        cmake_req_version = "3.16.0"
-        need_cmake = False
-
-        if tools.which("cmake") is None:
-          need_cmake = True
-        else:
-          output = io.StringIO()
-          self.run("cmake --version",output=output)
-          version = re.search( "cmake version (?P<version>\S*)", output.getvalue())
-          if tools.Version( version.group("version") ) < cmake_min_version:
-            need_cmake = True
-
-        if need_cmake:
-          self.build_requires(f"cmake_installer/{cmake_req_version}@conan/stable")
-
     def source(self):
       vmajor,vminor,vpatch = self.version.split(".")
       tools.get(f"https://support.hdfgroup.org/ftp/HDF5/releases/hdf5-{vmajor}.{vminor}/hdf5-{vmajor}.{vminor}.{vpatch}/src/hdf5-{vmajor}.{vminor}.{vpatch}.tar.gz")
@@ -55,8 +38,11 @@ class ConanPackage(ConanFile):
       next(pathlib.Path('.').glob('hdf5-*')).rename("hdf5")
 
 
-    def build(self):
-        cmake = CMake(self)
+    @property
+    def _source_subfolder(self):
+        return "hdf5"
+
+    def _cmake_definitions(self):
         defs = dict()
 
         defs['BUILD_SHARED_LIBS']  = "ON" if self.options.shared else "OFF"   # Build Shared Libraries
@@ -67,8 +53,8 @@ class ConanPackage(ConanFile):
         defs['HDF5_BUILD_EXAMPLES'] = "OFF" # Build HDF5 Library Examples
         defs['HDF5_BUILD_FORTRAN']  = "OFF" # Build FORTRAN support
         defs['HDF5_BUILD_JAVA']     = "OFF" # Build JAVA support
-        defs['HDF5_BUILD_HL_LIB']   = "ON"  # Build HIGH Level HDF5 Library
-        defs['HDF5_BUILD_TOOLS']    = "ON"  # Build HDF5 Tools
+        defs['HDF5_BUILD_HL_LIB']   = "ON" if self.options.hl else "OFF"    # Build HIGH Level HDF5 Library
+        defs['HDF5_BUILD_TOOLS']    = "ON" if self.options.tools else "OFF" # Build HDF5 Tools
 
         # These options are listed in the hdf5 cmake documentation. Not
         # sure if we should mess with them or now...
@@ -128,14 +114,8 @@ class ConanPackage(ConanFile):
       # H5_DEFAULT_PLUGINDIR    "/usr/local/hdf5/lib/plugin"
   # endif ()
 
+        return defs
 
-        cmake.configure(source_folder="hdf5", defs=defs)
-        cmake.build()
-
-    def package(self):
-        cmake = CMake(self)
-        cmake.install()
-        
     def package_info(self):
         self.env_info.hdf5_DIR = os.path.join(self.package_folder, "share", "cmake", "hdf5")
 
@@ -1,16 +1,9 @@
-from conans import ConanFile, CMake, tools
+from conans import ConanFile
 import os
-import platform
-import pathlib
-import glob
-import io
-import re
 
 class ConanPackage(ConanFile):
     name = "libIntegrate"
-    git_url_basename = "git://github.com/CD3"
     version = "1.1"
-    checkout = "v1.1"
     url = "https://github.com/CD3/cd3-conan-packages"
 
     author = "CD Clark III clifton.clark@gmail.com"
@@ -20,45 +13,11 @@ class ConanPackage(ConanFile):
 
     generators = "cmake", "virtualenv"
     requires = 'boost/1.69.0@conan/stable'
+    python_requires = "cd3-base/0.1@" + os.environ.get("CD3_CONAN_USER_CHANNEL", "cd3/devel")
+    python_requires_extend = "cd3-base.CD3Base"
 
-    @property
-    def git_url(self):
-      return f"{self.git_url_basename}/{self.name}"
+    def _cmake_definitions(self):
+        return {"BUILD_TESTS": "OFF"}
 
-    def build_requirements(self):
-        # we need a recent version of cmake to build. check if it is installed,
-        # and add it to the build_requires if not
-        cmake_min_version = "3.14.0"
-        cmake_req_version = "3.16.0"
-        need_cmake = False
-
-        if tools.which("cmake") is None:
-          need_cmake = True
-        else:
-          output = io.StringIO()
-          self.run("cmake --version",output=output)
-          version = re.search( "cmake version (?P<version>\S*)", output.getvalue())
-          if tools.Version( version.group("version") ) < cmake_min_version:
-            need_cmake = True
-
-        if need_cmake:
-          self.build_requires(f"cmake_installer/{cmake_req_version}@conan/stable")
-
-    def source(self):
-        self.run(f"git clone {self.git_url}")
-        self.run(f"cd {self.name} && git checkout {self.checkout} && git log -1")
-
-
-    def build(self):
-        cmake = CMake(self)
-        cmake.definitions["BUILD_TESTS"] = "OFF"
-        cmake.configure(source_folder=self.name)
-        cmake.build()
-
-    def package(self):
-        cmake = CMake(self)
-        cmake.install()
-        
     def package_info(self):
         self.env_info.libIntegrate_DIR = os.path.join(self.package_folder, "cmake")
-
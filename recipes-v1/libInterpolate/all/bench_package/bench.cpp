@@ -0,0 +1,169 @@
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <fstream>
+#include <functional>
+#include <iostream>
+#include <random>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#include <libInterpolate/Interpolate.hpp>
+
+// the results of one benchmark. each sample is the throughput of one repetition.
+struct Result {
+  std::string name;
+  std::vector<double> samples;
+};
+
+// run f() `repetitions` times and record the throughput of each run in items/s.
+Result measure(const std::string &name, std::size_t items, std::size_t repetitions,
+               const std::function<double()> &f)
+{
+  Result result{name, {}};
+  double checksum = 0;
+  for(std::size_t r = 0; r < repetitions; ++r) {
+    auto start = std::chrono::steady_clock::now();
+    checksum += f();
+    std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    result.samples.push_back(items / elapsed.count());
+  }
+  std::vector<double> sorted = result.samples;
+  std::sort(sorted.begin(), sorted.end());
+  // print the checksum so the work can not be optimized away
+  std::cout << name << ": " << sorted[sorted.size() / 2] << " items/s (checksum " << checksum << ")\n";
+  return result;
+}
+
+void write_json(const std::string &file, const std::vector<Result> &results)
+{
+  std::ofstream out(file);
+  out << "{\n  \"benchmarks\": [\n";
+  for(std::size_t i = 0; i < results.size(); ++i) {
+    out << "    {\"name\": \"" << results[i].name << "\", \"unit\": \"items/s\", \"higher_is_better\": true, \"samples\": [";
+    for(std::size_t j = 0; j < results[i].samples.size(); ++j) {
+      out << (j ? ", " : "") << results[i].samples[j];
+    }
+    out << "]}" << (i + 1 < results.size() ? "," : "") << "\n";
+  }
+  out << "  ]\n}\n";
+}
+
+std::vector<double> linspace(double a, double b, std::size_t n)
+{
+  std::vector<double> x(n);
+  for(std::size_t i = 0; i < n; ++i) {
+    x[i] = a + (b - a) * i / (n - 1);
+  }
+  return x;
+}
+
+std::vector<double> uniform(double a, double b, std::size_t n, unsigned seed)
+{
+  std::mt19937 gen(seed);
+  std::uniform_real_distribution<double> dist(a, b);
+  std::vector<double> x(n);
+  for(auto &v : x) {
+    v = dist(gen);
+  }
+  return x;
+}
+
+std::string label(const std::string &interpolator, const std::string &operation, std::size_t size, std::size_t queries = 0)
+{
+  std::ostringstream name;
+  name << interpolator << "/" << operation << "/" << size;
+  if(queries) {
+    name << "/" << queries;
+  }
+  return name.str();
+}
+
+// time setting the data of a 1D interpolator and evaluating it at random points.
+template<typename Interpolator>
+void bench_1d(const std::string &name, std::size_t size, const std::vector<std::size_t> &queries,
+              std::size_t repetitions, std::vector<Result> &results)
+{
+  std::vector<double> x = linspace(0, 10, size);
+  std::vector<double> y(size);
+  std::transform(x.begin(), x.end(), y.begin(), [](double v) { return std::sin(v); });
+
+  Interpolator interp;
+  results.push_back(measure(label(name, "construct", size), size, repetitions, [&]() {
+    interp.setData(x, y);
+    return interp(5.0);
+  }));
+
+  for(auto n : queries) {
+    std::vector<double> xi = uniform(0, 10, n, 1);
+    results.push_back(measure(label(name, "evaluate", size, n), n, repetitions, [&]() {
+      double sum = 0;
+      for(auto v : xi) {
+        sum += interp(v);
+      }
+      return sum;
+    }));
+  }
+}
+
+// the same for a 2D interpolator on a square grid with `size` points.
+template<typename Interpolator>
+void bench_2d(const std::string &name, std::size_t size, const std::vector<std::size_t> &queries,
+              std::size_t repetitions, std::vector<Result> &results)
+{
+  std::size_t n = static_cast<std::size_t>(std::sqrt(static_cast<double>(size)));
+  std::vector<double> grid = linspace(0, 10, n);
+  std::vector<double> x(n * n), y(n * n), z(n * n);
+  for(std::size_t i = 0; i < n; ++i) {
+    for(std::size_t j = 0; j < n; ++j) {
+      x[i * n + j] = grid[i];
+      y[i * n + j] = grid[j];
+      z[i * n + j] = std::sin(grid[i]) * std::cos(grid[j]);
+    }
+  }
+
+  Interpolator interp;
+  results.push_back(measure(label(name, "construct", n * n), n * n, repetitions, [&]() {
+    interp.setData(x, y, z);
+    return interp(5.0, 5.0);
+  }));
+
+  for(auto q : queries) {
+    std::vector<double> xi = uniform(0, 10, q, 1);
+    std::vector<double> yi = uniform(0, 10, q, 2);
+    results.push_back(measure(label(name, "evaluate", n * n, q), q, repetitions, [&]() {
+      double sum = 0;
+      for(std::size_t i = 0; i < q; ++i) {
+        sum += interp(xi[i], yi[i]);
+      }
+      return sum;
+    }));
+  }
+}
+
+int main(int argc, char *argv[])
+{
+  std::size_t repetitions = argc > 1 ? std::stoul(argv[1]) : 5;
+  std::string output = argc > 2 ? argv[2] : "";
+  std::size_t max_size = argc > 3 ? std::stoul(argv[3]) : 10000000;
+  std::vector<std::size_t> queries;
+  for(int i = 4; i < argc; ++i) {
+    queries.push_back(std::stoul(argv[i]));
+  }
+  if(queries.empty()) {
+    queries = {1000, 1000000};
+  }
+
+  std::vector<Result> results;
+  // 10^2 to 10^7 data points
+  for(std::size_t size = 100; size <= max_size; size *= 10) {
+    bench_1d<_1D::LinearInterpolator<double>>("linear", size, queries, repetitions, results);
+    bench_1d<_1D::CubicSplineInterpolator<double>>("cubic_spline", size, queries, repetitions, results);
+    bench_2d<_2D::BilinearInterpolator<double>>("bilinear", size, queries, repetitions, results);
+  }
+
+  if(!output.empty()) {
+    write_json(output, results);
+  }
+}
@@ -0,0 +1,30 @@
+from conans import ConanFile, CMake, tools
+import os, platform
+class Bench(ConanFile):
+  settings = "os", "compiler", "build_type", "arch"
+  generators = "cmake_find_package"
+
+  def build_requirements(self):
+    self.tool_requires(f"cmake/[>3.16.0]")
+
+  def build(self):
+    cmake = CMake(self)
+    cmake.configure()
+    cmake.build()
+
+  def test(self):
+    if self.settings.build_type != "Release":
+        self.output.warn("the benchmark was not built in Release mode, the results are not representative")
+    repetitions = self.conf.get("user.cd3:bench_repetitions", default=5)
+    # the results are written as JSON if an output file is given
+    output = self.conf.get("user.cd3:bench_output", default="")
+    # the largest number of data points, and the number of points each interpolator is evaluated at
+    max_size = self.conf.get("user.cd3:bench_max_size", default=10000000)
+    queries = self.conf.get("user.cd3:bench_queries", default="1000 1000000")
+    # e.g. "taskset -c 3" to pin the benchmark to a cpu
+    launcher = self.conf.get("user.cd3:bench_launcher", default="")
+    args = f'{repetitions} "{output}" {max_size} {queries}'
+    if platform.system() == "Windows":
+        self.run(f".\\Release\\bench.exe {args}")
+    else:
+        self.run(f"{launcher} ./bench {args}")
@@ -14,7 +14,7 @@ class ConanPackage(ConanFile):
     license = "MIT"
     topics = ("c++", "interpolation", "numerical interpolation")
     url = "https://github.com/CD3/cd3-conan-packages"
-    
+    python_requires = "cd3-base/0.1@" + os.environ.get("CD3_CONAN_USER_CHANNEL", "cd3/devel")
 
     @property
     def _source_subfolder(self):
@@ -36,6 +36,7 @@ class ConanPackage(ConanFile):
 
         # we are going to use cmake to package, even though this is header-only,
         # because there are some generated files that need to be included.
+        # there is nothing to compile though, so cmake is configured without a compiler.
 
         # remove the `find_package(...)` calls from the CMakeLists.txt
         # so that we can just install files into package directory
@@ -45,12 +46,12 @@ class ConanPackage(ConanFile):
         if self.version == "2.6":
             cmake_lists_content = re.sub(r"^\s*add_subdirectory\(.*testing.*$","",cmake_lists_content,flags=re.MULTILINE)
 
+        cmake_lists_content = self.python_requires["cd3-base"].module.header_only_cmakelists(cmake_lists_content)
         cmake_lists.write_text(cmake_lists_content)
 
         cmake = CMake(self)
         cmake.definitions["BUILD_TESTS"] = "OFF"
         cmake.configure(source_folder=self._source_subfolder)
-        cmake.build()
         cmake.install()
 
 
@@ -14,7 +14,7 @@ class ConanPackage(ConanFile):
     license = "MIT"
     topics = ("c++", "error propagation", "uncertainty")
     url = "https://github.com/CD3/cd3-conan-packages"
-    
+    python_requires = "cd3-base/0.1@" + os.environ.get("CD3_CONAN_USER_CHANNEL", "cd3/devel")
 
     @property
     def _source_subfolder(self):
@@ -37,10 +37,13 @@ class ConanPackage(ConanFile):
 
         # we are going to use cmake to package, even though this is header-only,
         # because there are some generated files that need to be included.
+        # there is nothing to compile, so cmake is configured without a compiler.
+        cmake_lists = pathlib.Path(self._source_subfolder)/"CMakeLists.txt"
+        cmake_lists.write_text(self.python_requires["cd3-base"].module.header_only_cmakelists(cmake_lists.read_text()))
+
         cmake = CMake(self)
         cmake.definitions["BUILD_UNIT_TESTS"] = "OFF"
         cmake.configure(source_folder=self._source_subfolder)
-        cmake.build()
         cmake.install()
 
 
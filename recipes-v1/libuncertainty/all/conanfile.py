@@ -14,7 +14,7 @@ class ConanPackage(ConanFile):
     license = "MIT"
     topics = ("c++", "uncertainty", "error propagation")
     url = "https://github.com/CD3/cd3-conan-packages"
-    
+    python_requires = "cd3-base/0.1@" + os.environ.get("CD3_CONAN_USER_CHANNEL", "cd3/devel")
 
     @property
     def _source_subfolder(self):
@@ -29,6 +29,10 @@ class ConanPackage(ConanFile):
     def package(self):
         self.copy(pattern="LICENSE.md", dst="licenses", src=self._source_subfolder)
 
+        # there is nothing to compile, so cmake is configured without a compiler.
+        cmake_lists = pathlib.Path(self._source_subfolder)/"CMakeLists.txt"
+        cmake_lists.write_text(self.python_requires["cd3-base"].module.header_only_cmakelists(cmake_lists.read_text()))
+
         cmake = CMake(self)
         cmake.definitions["BUILD_UNIT_TESTS"] = "OFF"
         # the libUncertainty CMakeLists.txt does not handle generating the version.h file
@@ -37,7 +41,6 @@ class ConanPackage(ConanFile):
         cmake.definitions["GIT_COMMIT_DESC"] = f"{self.version}"
         cmake.definitions["GIT_COMMIT_BRANCH"] = f"conan"
         cmake.configure(source_folder=self._source_subfolder)
-        cmake.build()
         cmake.install()
 
 
@@ -0,0 +1,300 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <hdf5.h>
+#if defined(__unix__) || defined(__APPLE__)
+#include <sys/resource.h>
+#include <unistd.h>
+#elif defined(_WIN32)
+#include <process.h>
+#define getpid _getpid
+#endif
+
+/* the dataset is a 2D array of doubles with this many columns */
+#define COLUMNS 4096
+/* rows written or read by each call to H5Dwrite/H5Dread */
+#define SLAB_ROWS 2048
+#define MAX_RESULTS 1024
+#define MAX_SAMPLES 100
+
+struct result {
+  char name[256];
+  const char *unit;
+  int higher_is_better;
+  int nsamples;
+  double samples[MAX_SAMPLES];
+};
+
+static struct result results[MAX_RESULTS];
+static int nresults = 0;
+
+static void add_sample(const char *name, const char *unit, int higher_is_better, double value)
+{
+  int i;
+  for(i = 0; i < nresults; ++i) {
+    if(strcmp(results[i].name, name) == 0)
+      break;
+  }
+  if(i == nresults) {
+    if(nresults == MAX_RESULTS)
+      return;
+    snprintf(results[i].name, sizeof(results[i].name), "%s", name);
+    results[i].unit = unit;
+    results[i].higher_is_better = higher_is_better;
+    results[i].nsamples = 0;
+    ++nresults;
+  }
+  if(results[i].nsamples < MAX_SAMPLES)
+    results[i].samples[results[i].nsamples++] = value;
+}
+
+static void write_json(const char *file, int threadsafe)
+{
+  FILE *out = fopen(file, "w");
+  if(!out)
+    return;
+  unsigned majnum, minnum, relnum;
+  H5get_libversion(&majnum, &minnum, &relnum);
+  fprintf(out, "{\n  \"context\": {\"hdf5_version\": \"%u.%u.%u\", \"threadsafe\": %s},\n", majnum, minnum, relnum, threadsafe ? "true" : "false");
+  fprintf(out, "  \"benchmarks\": [\n");
+  for(int i = 0; i < nresults; ++i) {
+    fprintf(out, "    {\"name\": \"%s\", \"unit\": \"%s\", \"higher_is_better\": %s, \"samples\": [", results[i].name, results[i].unit,
+            results[i].higher_is_better ? "true" : "false");
+    for(int j = 0; j < results[i].nsamples; ++j)
+      fprintf(out, "%s%g", j ? ", " : "", results[i].samples[j]);
+    fprintf(out, "]}%s\n", i + 1 < nresults ? "," : "");
+  }
+  fprintf(out, "  ]\n}\n");
+  fclose(out);
+}
+
+static double now(void)
+{
+  struct timespec ts;
+  timespec_get(&ts, TIME_UTC);
+  return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+/* reset the peak resident set size of the process. only possible on linux. */
+static void reset_peak_rss(void)
+{
+  FILE *f = fopen("/proc/self/clear_refs", "w");
+  if(f) {
+    fputs("5", f);
+    fclose(f);
+  }
+}
+
+/* peak resident set size in MB since the last reset, or since the process started. */
+static double peak_rss(void)
+{
+  char line[256];
+  FILE *f = fopen("/proc/self/status", "r");
+  if(f) {
+    while(fgets(line, sizeof(line), f)) {
+      if(strncmp(line, "VmHWM:", 6) == 0) {
+        fclose(f);
+        return atof(line + 6) / 1024;
+      }
+    }
+    fclose(f);
+  }
+#if defined(__unix__) || defined(__APPLE__)
+  struct rusage usage;
+  getrusage(RUSAGE_SELF, &usage);
+#if defined(__APPLE__)
+  return usage.ru_maxrss / (1024.0 * 1024.0);
+#else
+  return usage.ru_maxrss / 1024.0;
+#endif
+#else
+  return 0;
+#endif
+}
+
+static hid_t make_fapl(const char *vfd)
+{
+  hid_t fapl = H5Pcreate(H5P_FILE_ACCESS);
+  if(strcmp(vfd, "core") == 0)
+    /* keep the file in memory and write it to disk when it is closed */
+    H5Pset_fapl_core(fapl, 64 * 1024 * 1024, 1);
+  else
+    H5Pset_fapl_sec2(fapl);
+  return fapl;
+}
+
+/* write a rows x COLUMNS dataset in slabs and return the time it took, or a negative number on failure. */
+static double write_file(const char *file, const char *vfd, hsize_t rows, const hsize_t *chunk, int deflate, double *buffer)
+{
+  hsize_t dims[2] = {rows, COLUMNS};
+  double start = now();
+  hid_t fapl = make_fapl(vfd);
+  hid_t fid = H5Fcreate(file, H5F_ACC_TRUNC, H5P_DEFAULT, fapl);
+  H5Pclose(fapl);
+  if(fid < 0)
+    return -1;
+
+  hid_t dcpl = H5Pcreate(H5P_DATASET_CREATE);
+  if(chunk) {
+    H5Pset_chunk(dcpl, 2, chunk);
+    if(deflate > 0)
+      H5Pset_deflate(dcpl, deflate);
+  }
+  hid_t space = H5Screate_simple(2, dims, NULL);
+  hid_t dset = H5Dcreate2(fid, "data", H5T_NATIVE_DOUBLE, space, H5P_DEFAULT, dcpl, H5P_DEFAULT);
+  H5Pclose(dcpl);
+
+  herr_t status = 0;
+  for(hsize_t row = 0; row < rows && status >= 0; row += SLAB_ROWS) {
+    hsize_t offset[2] = {row, 0};
+    hsize_t count[2] = {rows - row < SLAB_ROWS ? rows - row : SLAB_ROWS, COLUMNS};
+    hid_t memspace = H5Screate_simple(2, count, NULL);
+    H5Sselect_hyperslab(space, H5S_SELECT_SET, offset, NULL, count, NULL);
+    status = H5Dwrite(dset, H5T_NATIVE_DOUBLE, memspace, space, H5P_DEFAULT, buffer);
+    H5Sclose(memspace);
+  }
+  H5Dclose(dset);
+  H5Sclose(space);
+  H5Fclose(fid);
+  return status < 0 ? -1 : now() - start;
+}
+
+static double read_file(const char *file, const char *vfd, hsize_t rows, double *buffer, double *checksum)
+{
+  double start = now();
+  hid_t fapl = make_fapl(vfd);
+  hid_t fid = H5Fopen(file, H5F_ACC_RDONLY, fapl);
+  H5Pclose(fapl);
+  if(fid < 0)
+    return -1;
+  hid_t dset = H5Dopen2(fid, "data", H5P_DEFAULT);
+  hid_t space = H5Dget_space(dset);
+
+  herr_t status = 0;
+  for(hsize_t row = 0; row < rows && status >= 0; row += SLAB_ROWS) {
+    hsize_t offset[2] = {row, 0};
+    hsize_t count[2] = {rows - row < SLAB_ROWS ? rows - row : SLAB_ROWS, COLUMNS};
+    hid_t memspace = H5Screate_simple(2, count, NULL);
+    H5Sselect_hyperslab(space, H5S_SELECT_SET, offset, NULL, count, NULL);
+    status = H5Dread(dset, H5T_NATIVE_DOUBLE, memspace, space, H5P_DEFAULT, buffer);
+    H5Sclose(memspace);
+    *checksum += buffer[0];
+  }
+  H5Sclose(space);
+  H5Dclose(dset);
+  H5Fclose(fid);
+  return status < 0 ? -1 : now() - start;
+}
+
+/* split a comma separated list in place. returns the number of items. */
+static int split(char *list, char **items, int max)
+{
+  int n = 0;
+  for(char *item = strtok(list, ","); item && n < max; item = strtok(NULL, ","))
+    items[n++] = item;
+  return n;
+}
+
+int main(int argc, char *argv[])
+{
+  int repetitions = argc > 1 ? atoi(argv[1]) : 3;
+  const char *output = argc > 2 ? argv[2] : "";
+  double size_mb = argc > 3 ? atof(argv[3]) : 1024;
+  /* label=directory pairs the files are written to, e.g. disk=.,tmpfs=/dev/shm */
+  char dirs_arg[4096], chunks_arg[1024], deflate_arg[256];
+  snprintf(dirs_arg, sizeof(dirs_arg), "%s", argc > 4 ? argv[4] : "disk=.,tmpfs=/dev/shm");
+  /* chunk shapes as rowsxcolumns, or contiguous */
+  snprintf(chunks_arg, sizeof(chunks_arg), "%s", argc > 5 ? argv[5] : "contiguous,64x4096,1024x1024");
+  snprintf(deflate_arg, sizeof(deflate_arg), "%s", argc > 6 ? argv[6] : "0,1");
+  if(repetitions > MAX_SAMPLES)
+    repetitions = MAX_SAMPLES;
+
+  char *dirs[16], *chunks[16], *deflates[16];
+  int ndirs = split(dirs_arg, dirs, 16);
+  int nchunks = split(chunks_arg, chunks, 16);
+  int ndeflates = split(deflate_arg, deflates, 16);
+  const char *vfds[] = {"sec2", "core"};
+
+  hbool_t threadsafe = 0;
+  H5is_library_threadsafe(&threadsafe);
+  int have_deflate = H5Zfilter_avail(H5Z_FILTER_DEFLATE) > 0;
+
+  hsize_t rows = (hsize_t)(size_mb * 1024 * 1024 / (sizeof(double) * COLUMNS));
+  double mb = rows * COLUMNS * sizeof(double) / (1024.0 * 1024.0);
+  double *buffer = malloc(sizeof(double) * SLAB_ROWS * COLUMNS);
+  if(!buffer || rows == 0)
+    return 1;
+  /* smooth data with some noise, so it compresses somewhat */
+  srand(1);
+  for(size_t i = 0; i < (size_t)SLAB_ROWS * COLUMNS; ++i)
+    buffer[i] = (double)(i % COLUMNS) + (double)rand() / RAND_MAX;
+  printf("HDF5 I/O benchmark: %.0f MB per file, threadsafe library: %d\n", mb, (int)threadsafe);
+
+  int failed = 0;
+  double checksum = 0;
+  for(int d = 0; d < ndirs; ++d) {
+    char *label = dirs[d], *dir = strchr(dirs[d], '=');
+    if(dir)
+      *dir++ = '\0';
+    else
+      dir = label;
+    /* several benchmarks may use the same directory at the same time */
+    char file[4096];
+    snprintf(file, sizeof(file), "%s/hdf5-bench-%d.h5", dir, (int)getpid());
+    FILE *probe = fopen(file, "w");
+    if(!probe) {
+      printf("%s: cannot write to %s, skipping it\n", label, dir);
+      continue;
+    }
+    fclose(probe);
+    remove(file);
+    for(int v = 0; v < 2; ++v) {
+      for(int c = 0; c < nchunks; ++c) {
+        hsize_t chunk[2] = {0, 0};
+        int chunked = sscanf(chunks[c], "%llux%llu", (unsigned long long *)&chunk[0], (unsigned long long *)&chunk[1]) == 2;
+        if(chunked) {
+          chunk[0] = chunk[0] < rows ? chunk[0] : rows;
+          chunk[1] = chunk[1] < COLUMNS ? chunk[1] : COLUMNS;
+        }
+        for(int z = 0; z < ndeflates; ++z) {
+          int level = atoi(deflates[z]);
+          /* compression needs a chunked layout and the zlib filter */
+          if(level > 0 && (!chunked || !have_deflate))
+            continue;
+          char name[256];
+          for(int r = 0; r < repetitions; ++r) {
+            reset_peak_rss();
+            double write_time = write_file(file, vfds[v], rows, chunked ? chunk : NULL, level, buffer);
+            double write_rss = peak_rss();
+            reset_peak_rss();
+            double read_time = write_time < 0 ? -1 : read_file(file, vfds[v], rows, buffer, &checksum);
+            double read_rss = peak_rss();
+            remove(file);
+            if(write_time < 0 || read_time < 0) {
+              fprintf(stderr, "failed to write or read %s with the %s driver\n", file, vfds[v]);
+              failed = 1;
+              break;
+            }
+            snprintf(name, sizeof(name), "write/%s/%s/chunk=%s/deflate=%d", vfds[v], label, chunks[c], level);
+            add_sample(name, "MB/s", 1, mb / write_time);
+            snprintf(name, sizeof(name), "write/%s/%s/chunk=%s/deflate=%d/peak_rss", vfds[v], label, chunks[c], level);
+            add_sample(name, "MB", 0, write_rss);
+            snprintf(name, sizeof(name), "read/%s/%s/chunk=%s/deflate=%d", vfds[v], label, chunks[c], level);
+            add_sample(name, "MB/s", 1, mb / read_time);
+            snprintf(name, sizeof(name), "read/%s/%s/chunk=%s/deflate=%d/peak_rss", vfds[v], label, chunks[c], level);
+            add_sample(name, "MB", 0, read_rss);
+          }
+          printf("%s %s %s deflate=%d: done\n", label, vfds[v], chunks[c], level);
+        }
+      }
+    }
+  }
+  /* print the checksum so the reads can not be optimized away */
+  printf("checksum: %g\n", checksum);
+
+  free(buffer);
+  if(output[0])
+    write_json(output, threadsafe);
+  return failed;
+}
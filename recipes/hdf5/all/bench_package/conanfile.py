@@ -0,0 +1,48 @@
+import os
+
+from conan import ConanFile
+from conan.tools.build import can_run
+from conan.tools.cmake import CMake, CMakeDeps, CMakeToolchain, cmake_layout
+
+
+class hdf5BenchConan(ConanFile):
+    settings = "os", "compiler", "build_type", "arch"
+
+    def requirements(self):
+        self.requires(self.tested_reference_str)
+
+    def generate(self):
+        deps = CMakeDeps(self)
+        deps.generate()
+        tc = CMakeToolchain(self)
+        launcher = self.conf.get("user.cd3:compiler_launcher")
+        if launcher:
+            tc.cache_variables["CMAKE_C_COMPILER_LAUNCHER"] = launcher
+        tc.generate()
+
+    def build(self):
+        cmake = CMake(self)
+        cmake.configure()
+        cmake.build()
+
+    def layout(self):
+        cmake_layout(self)
+
+    def test(self):
+        if self.settings.build_type != "Release":
+            self.output.warning("the benchmark was not built in Release mode, the results are not representative")
+        if can_run(self):
+            cmd = os.path.join(self.cpp.build.bindir, "bench")
+            repetitions = self.conf.get("user.cd3:bench_repetitions", default=3)
+            # the results are written as JSON if an output file is given
+            output = self.conf.get("user.cd3:bench_output", default="")
+            # size of the file written by each case. use several GB to get past the page cache.
+            size_mb = self.conf.get("user.cd3:bench_size_mb", default=1024)
+            # label=directory pairs to write the files to. "." is the build folder of the benchmark.
+            dirs = self.conf.get("user.cd3:bench_dirs", default="disk=.,tmpfs=/dev/shm")
+            # chunk shapes (rows x columns of a 4096 column dataset) and deflate levels
+            chunks = self.conf.get("user.cd3:bench_chunks", default="contiguous,64x4096,1024x1024")
+            deflate = self.conf.get("user.cd3:bench_deflate", default="0,1")
+            # e.g. "taskset -c 3" to pin the benchmark to a cpu
+            launcher = self.conf.get("user.cd3:bench_launcher", default="")
+            self.run(f'{launcher} {cmd} {repetitions} "{output}" {size_mb} "{dirs}" "{chunks}" "{deflate}"', env="conanrun")
@@ -0,0 +1,188 @@
+import os
+
+from conan import ConanFile
+from conan.errors import ConanInvalidConfiguration
+from conan.tools.cmake import CMake, CMakeDeps, CMakeToolchain, cmake_layout
+from conan.tools.files import copy, get, rm, rmdir
+
+
+class hdf5Recipe(ConanFile):
+    name = "hdf5"
+    package_type = "library"
+
+    description = "HDF5 C and C++ libraries"
+    license = "BSD-3-Clause"
+    topics = ("hdf5", "hdf", "data", "io")
+    url = "https://github.com/CD3/cd3-conan-packages"
+    homepage = "https://www.hdfgroup.org/solutions/hdf5/"
+    settings = "os", "compiler", "build_type", "arch"
+    options = {
+        "shared": [True, False],
+        "fPIC": [True, False],
+        "cxx": [True, False],
+        # the high level (H5LT, H5TB, ...) libraries.
+        "hl": [True, False],
+        # h5dump, h5ls, h5repack and the other command line tools.
+        "tools": [True, False],
+        # serialize calls into the library so it can be used from several threads.
+        "threadsafe": [True, False],
+        # use pread/pwrite instead of lseek+read/write in the sec2, log and core drivers.
+        "preadwrite": [True, False],
+        # build the O_DIRECT virtual file driver (linux only).
+        "direct_vfd": [True, False],
+        "with_zlib": [True, False],
+        # szip compression is provided by libaec.
+        "szip_support": [None, "with_libaec"],
+        "szip_encoding": [True, False],
+    }
+    default_options = {
+        "shared": False,
+        "fPIC": True,
+        "cxx": True,
+        "hl": True,
+        "tools": False,
+        "threadsafe": False,
+        "preadwrite": True,
+        "direct_vfd": False,
+        "with_zlib": True,
+        "szip_support": None,
+        "szip_encoding": False,
+    }
+
+    def config_options(self):
+        if self.settings.os == "Windows":
+            self.options.rm_safe("fPIC")
+            self.options.rm_safe("preadwrite")
+        if self.settings.os != "Linux":
+            self.options.rm_safe("direct_vfd")
+
+    def configure(self):
+        if self.options.shared:
+            self.options.rm_safe("fPIC")
+        if not self.options.cxx:
+            self.settings.rm_safe("compiler.libcxx")
+            self.settings.rm_safe("compiler.cppstd")
+        if not self.options.szip_support:
+            # only changes the binary when szip is enabled
+            self.options.rm_safe("szip_encoding")
+
+    def layout(self):
+        cmake_layout(self, src_folder="src")
+
+    def requirements(self):
+        if self.options.with_zlib:
+            self.requires("zlib/[>=1.2.11 <2]")
+        if self.options.szip_support == "with_libaec":
+            self.requires("libaec/1.0.6")
+
+    def validate(self):
+        if self.options.threadsafe and self.settings.os == "Windows" and not self.options.shared:
+            raise ConanInvalidConfiguration("the thread-safe hdf5 library can only be built as a shared library on Windows")
+
+    def source(self):
+        get(self, **self.conan_data["sources"][self.version], strip_root=True)
+
+    def generate(self):
+        deps = CMakeDeps(self)
+        # hdf5 looks for szip with find_package(SZIP)
+        deps.set_property("libaec", "cmake_file_name", "SZIP")
+        deps.generate()
+
+        tc = CMakeToolchain(self)
+        tc.cache_variables["BUILD_SHARED_LIBS"] = bool(self.options.shared)
+        tc.cache_variables["ONLY_SHARED_LIBS"] = bool(self.options.shared)
+        tc.cache_variables["BUILD_STATIC_EXECS"] = False
+        tc.cache_variables["BUILD_TESTING"] = False
+        tc.cache_variables["HDF5_BUILD_EXAMPLES"] = False
+        tc.cache_variables["HDF5_BUILD_FORTRAN"] = False
+        tc.cache_variables["HDF5_BUILD_JAVA"] = False
+        tc.cache_variables["HDF5_BUILD_CPP_LIB"] = bool(self.options.cxx)
+        tc.cache_variables["HDF5_BUILD_HL_LIB"] = bool(self.options.hl)
+        tc.cache_variables["HDF5_BUILD_TOOLS"] = bool(self.options.tools)
+        tc.cache_variables["HDF5_NO_PACKAGES"] = True
+        tc.cache_variables["HDF5_ALLOW_EXTERNAL_SUPPORT"] = "NO"
+        tc.cache_variables["HDF5_ENABLE_THREADSAFE"] = bool(self.options.threadsafe)
+        if self.options.threadsafe and (self.options.cxx or self.options.hl):
+            # hdf5 refuses to build the C++ and high level libraries with the thread-safe
+            # library, since they are not thread-safe themselves.
+            tc.cache_variables["ALLOW_UNSUPPORTED"] = True
+        tc.cache_variables["HDF5_ENABLE_PREADWRITE"] = bool(self.options.get_safe("preadwrite", False))
+        tc.cache_variables["HDF5_ENABLE_DIRECT_VFD"] = bool(self.options.get_safe("direct_vfd", False))
+        tc.cache_variables["HDF5_ENABLE_Z_LIB_SUPPORT"] = bool(self.options.with_zlib)
+        tc.cache_variables["HDF5_ENABLE_SZIP_SUPPORT"] = bool(self.options.szip_support)
+        tc.cache_variables["HDF5_ENABLE_SZIP_ENCODING"] = bool(self.options.get_safe("szip_encoding", False))
+        # e.g. -c user.cd3:compiler_launcher=ccache
+        launcher = self.conf.get("user.cd3:compiler_launcher")
+        if launcher:
+            tc.cache_variables["CMAKE_C_COMPILER_LAUNCHER"] = launcher
+            tc.cache_variables["CMAKE_CXX_COMPILER_LAUNCHER"] = launcher
+        tc.generate()
+
+    def build(self):
+        cmake = CMake(self)
+        cmake.configure()
+        cmake.build()
+
+    def package(self):
+        copy(self, "COPYING", self.source_folder, os.path.join(self.package_folder, "licenses"))
+        cmake = CMake(self)
+        cmake.install()
+        # conan generates the cmake and pkg-config files
+        rmdir(self, os.path.join(self.package_folder, "cmake"))
+        rmdir(self, os.path.join(self.package_folder, "share"))
+        rmdir(self, os.path.join(self.package_folder, "lib", "pkgconfig"))
+        rm(self, "*.pdb", self.package_folder, recursive=True)
+
+    def _lib_name(self, name):
+        # hdf5 adds a _D suffix to debug libraries on Windows, and _debug everywhere else
+        if self.settings.build_type == "Debug":
+            name += "_D" if self.settings.os == "Windows" else "_debug"
+        if self.settings.os == "Windows" and not self.options.shared:
+            name = "lib" + name
+        return name
+
+    def package_info(self):
+        self.cpp_info.set_property("cmake_file_name", "HDF5")
+        self.cpp_info.set_property("cmake_target_name", "HDF5::HDF5")
+        # the c component is hdf5.pc, so the file for all of them needs another name
+        self.cpp_info.set_property("pkg_config_name", "hdf5-all-do-not-use")
+
+        # consumers can link only the libraries they use, e.g. hdf5::c or hdf5::cxx.
+        # HDF5::HDF5 links all of them.
+        c = self.cpp_info.components["c"]
+        c.set_property("pkg_config_name", "hdf5")
+        c.libs = [self._lib_name("hdf5")]
+        if self.options.with_zlib:
+            c.requires.append("zlib::zlib")
+        if self.options.szip_support == "with_libaec":
+            c.requires.append("libaec::libaec")
+        if self.options.shared:
+            c.defines.append("H5_BUILT_AS_DYNAMIC_LIB")
+        if self.settings.os in ["Linux", "FreeBSD"]:
+            c.system_libs = ["dl", "m"]
+            if self.options.threadsafe:
+                c.system_libs.append("pthread")
+
+        if self.options.hl:
+            hl = self.cpp_info.components["hl"]
+            hl.set_property("pkg_config_name", "hdf5_hl")
+            hl.libs = [self._lib_name("hdf5_hl")]
+            hl.requires = ["c"]
+        if self.options.cxx:
+            cxx = self.cpp_info.components["cxx"]
+            cxx.set_property("pkg_config_name", "hdf5_cpp")
+            cxx.libs = [self._lib_name("hdf5_cpp")]
+            cxx.requires = ["c"]
+        if self.options.hl and self.options.cxx:
+            hl_cxx = self.cpp_info.components["hl_cxx"]
+            hl_cxx.set_property("pkg_config_name", "hdf5_hl_cpp")
+            hl_cxx.libs = [self._lib_name("hdf5_hl_cpp")]
+            hl_cxx.requires = ["hl", "cxx"]
+        if self.options.tools:
+            # consumers only need the executables on the PATH
+            tools = self.cpp_info.components["tools"]
+            tools.libs = []
+            tools.includedirs = []
+            tools.libdirs = []
+            tools.bindirs = ["bin"]
+            tools.requires = ["c"]
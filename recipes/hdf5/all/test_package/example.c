@@ -0,0 +1,17 @@
+#include <stdio.h>
+#include <hdf5.h>
+
+int main()
+{
+  unsigned majnum, minnum, relnum;
+  hbool_t threadsafe;
+  H5get_libversion(&majnum, &minnum, &relnum);
+  H5is_library_threadsafe(&threadsafe);
+  printf("HDF5 %u.%u.%u (threadsafe: %d)\n", majnum, minnum, relnum, (int)threadsafe);
+
+  hid_t file = H5Fcreate("test.h5", H5F_ACC_TRUNC, H5P_DEFAULT, H5P_DEFAULT);
+  if(file < 0)
+    return 1;
+  H5Fclose(file);
+  return 0;
+}
@@ -2,17 +2,25 @@ import os
 
 from conan import ConanFile
 from conan.tools.build import can_run
-from conan.tools.cmake import CMake, cmake_layout
+from conan.tools.cmake import CMake, CMakeDeps, CMakeToolchain, cmake_layout
 
 
 class unitconvertTestConan(ConanFile):
     settings = "os", "compiler", "build_type", "arch"
-    generators = "CMakeDeps", "CMakeToolchain"
 
     def requirements(self):
         self.requires(self.tested_reference_str)
         self.requires("boost/1.86.0")
 
+    def generate(self):
+        deps = CMakeDeps(self)
+        deps.generate()
+        tc = CMakeToolchain(self)
+        launcher = self.conf.get("user.cd3:compiler_launcher")
+        if launcher:
+            tc.cache_variables["CMAKE_CXX_COMPILER_LAUNCHER"] = launcher
+        tc.generate()
+
     def build(self):
         cmake = CMake(self)
         cmake.configure()
@@ -0,0 +1,110 @@
+#include <algorithm>
+#include <chrono>
+#include <fstream>
+#include <functional>
+#include <iostream>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <UnitConvert.hpp>
+
+// the results of one benchmark. each sample is the throughput of one repetition.
+struct Result {
+  std::string name;
+  std::vector<double> samples;
+};
+
+// run f(n) `repetitions` times and record the throughput of each run in items/s.
+Result measure(const std::string &name, std::size_t n, std::size_t repetitions,
+               const std::function<double(std::size_t)> &f)
+{
+  Result result{name, {}};
+  double checksum = 0;
+  for(std::size_t r = 0; r < repetitions; ++r) {
+    auto start = std::chrono::steady_clock::now();
+    checksum += f(n);
+    std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    result.samples.push_back(n / elapsed.count());
+  }
+  std::vector<double> sorted = result.samples;
+  std::sort(sorted.begin(), sorted.end());
+  // print the checksum so the work can not be optimized away
+  std::cout << name << ": " << sorted[sorted.size() / 2] << " items/s (checksum " << checksum << ")\n";
+  return result;
+}
+
+void write_json(const std::string &file, const std::vector<Result> &results)
+{
+  std::ofstream out(file);
+  out << "{\n  \"benchmarks\": [\n";
+  for(std::size_t i = 0; i < results.size(); ++i) {
+    out << "    {\"name\": \"" << results[i].name << "\", \"unit\": \"items/s\", \"higher_is_better\": true, \"samples\": [";
+    for(std::size_t j = 0; j < results[i].samples.size(); ++j) {
+      out << (j ? ", " : "") << results[i].samples[j];
+    }
+    out << "]}" << (i + 1 < results.size() ? "," : "") << "\n";
+  }
+  out << "  ]\n}\n";
+}
+
+int main(int argc, char *argv[])
+{
+  std::size_t n = argc > 1 ? std::stoul(argv[1]) : 100000;
+  std::size_t repetitions = argc > 2 ? std::stoul(argv[2]) : 5;
+  std::string output = argc > 3 ? argv[3] : "";
+
+  UnitConvert::UnitRegistry ureg;
+  ureg.addUnit("m = [L]");
+  ureg.addUnit("g = [M]");
+  ureg.addUnit("s = [T]");
+  ureg.addUnit("cm = 0.01 m");
+  ureg.addUnit("km = 1000 m");
+  ureg.addUnit("kg = 1000 g");
+  ureg.addUnit("min = 60 s");
+  ureg.addUnit("hr = 60 min");
+  ureg.addUnit("N = kg*m/s^2");
+  ureg.addUnit("J = N*m");
+  ureg.addUnit("W = J/s");
+
+  std::vector<std::pair<std::string, std::string>> pairs = {
+      {"cm", "m"}, {"km/hr", "m/s"}, {"kg*m/s^2", "N"}, {"W*hr", "J"}, {"g/cm^3", "kg/m^3"}};
+
+  std::vector<Result> results;
+
+  // parse a unit string into a quantity.
+  results.push_back(measure("parse", n, repetitions, [&](std::size_t n) {
+    double sum = 0;
+    for(std::size_t i = 0; i < n; ++i) {
+      sum += ureg.makeQuantity<double>(1.0, pairs[i % pairs.size()].first).value();
+    }
+    return sum;
+  }));
+
+  // compute the conversion factor between two unit strings.
+  results.push_back(measure("factor_lookup", n, repetitions, [&](std::size_t n) {
+    double sum = 0;
+    for(std::size_t i = 0; i < n; ++i) {
+      const auto &pair = pairs[i % pairs.size()];
+      sum += ureg.makeQuantity<double>(1.0, pair.first).to(pair.second).value();
+    }
+    return sum;
+  }));
+
+  // convert many quantities that already exist to the same unit.
+  std::vector<UnitConvert::Quantity<double>> quantities;
+  for(std::size_t i = 0; i < n; ++i) {
+    quantities.push_back(ureg.makeQuantity<double>(static_cast<double>(i), "km/hr"));
+  }
+  results.push_back(measure("bulk_convert", n, repetitions, [&](std::size_t n) {
+    double sum = 0;
+    for(std::size_t i = 0; i < n; ++i) {
+      sum += quantities[i].to("m/s").value();
+    }
+    return sum;
+  }));
+
+  if(!output.empty()) {
+    write_json(output, results);
+  }
+}
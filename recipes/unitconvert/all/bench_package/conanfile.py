@@ -0,0 +1,43 @@
+import os
+
+from conan import ConanFile
+from conan.tools.build import can_run
+from conan.tools.cmake import CMake, CMakeDeps, CMakeToolchain, cmake_layout
+
+
+class unitconvertBenchConan(ConanFile):
+    settings = "os", "compiler", "build_type", "arch"
+
+    def requirements(self):
+        self.requires(self.tested_reference_str)
+        self.requires("boost/1.86.0", options={"header_only": True})
+
+    def generate(self):
+        deps = CMakeDeps(self)
+        deps.generate()
+        tc = CMakeToolchain(self)
+        launcher = self.conf.get("user.cd3:compiler_launcher")
+        if launcher:
+            tc.cache_variables["CMAKE_CXX_COMPILER_LAUNCHER"] = launcher
+        tc.generate()
+
+    def build(self):
+        cmake = CMake(self)
+        cmake.configure()
+        cmake.build()
+
+    def layout(self):
+        cmake_layout(self)
+
+    def test(self):
+        if self.settings.build_type != "Release":
+            self.output.warning("the benchmark was not built in Release mode, the results are not representative")
+        if can_run(self):
+            cmd = os.path.join(self.cpp.build.bindir, "bench")
+            iterations = self.conf.get("user.cd3:bench_iterations", default=100000)
+            repetitions = self.conf.get("user.cd3:bench_repetitions", default=5)
+            # the results are written as JSON if an output file is given
+            output = self.conf.get("user.cd3:bench_output", default="")
+            # e.g. "taskset -c 3" to pin the benchmark to a cpu
+            launcher = self.conf.get("user.cd3:bench_launcher", default="")
+            self.run(f'{launcher} {cmd} {iterations} {repetitions} "{output}"', env="conanrun")
@@ -1,8 +1,10 @@
 import pathlib
 
 from conan import ConanFile
+from conan.errors import ConanInvalidConfiguration
 from conan.tools.cmake import CMake, CMakeDeps, CMakeToolchain, cmake_layout
 from conan.tools.files import copy, get, replace_in_file
+from conan.tools.scm import Version
 
 
 class unitconvertRecipe(ConanFile):
@@ -14,8 +16,21 @@ class unitconvertRecipe(ConanFile):
     topics = ("C++", "physics", "dimensional analysis", "unit conversions")
     url = "https://github.com/CD3/cd3-conan-packages"
     settings = "os", "compiler", "build_type", "arch"
-    options = {"shared": [True, False], "fPIC": [True, False]}
-    default_options = {"shared": False, "fPIC": True}
+    options = {
+        "shared": [True, False],
+        "fPIC": [True, False],
+        # build with link-time (interprocedural) optimization.
+        "ipo": [True, False],
+        # x86-64 micro-architecture level to generate code for. the library will not
+        # run on cpus below that level.
+        "microarch": [None, "x86-64-v2", "x86-64-v3", "x86-64-v4"],
+    }
+    default_options = {"shared": False, "fPIC": True, "ipo": False, "microarch": None}
+
+    # first compiler versions that accept -march=x86-64-v<N>
+    _microarch_min_versions = {"gcc": "11", "clang": "12", "apple-clang": "13"}
+    # msvc only has /arch switches for the instruction sets, and nothing for v2.
+    _msvc_arch_flags = {"x86-64-v3": "/arch:AVX2", "x86-64-v4": "/arch:AVX512"}
 
     def requirements(self):
         self.requires("boost/1.86.0", transitive_headers=True)
@@ -23,11 +38,35 @@ class unitconvertRecipe(ConanFile):
     def config_options(self):
         if self.settings.os == "Windows":
             self.options.rm_safe("fPIC")
+        if self.settings.arch != "x86_64":
+            self.options.rm_safe("microarch")
 
     def configure(self):
         if self.options.shared:
             self.options.rm_safe("fPIC")
 
+    def validate(self):
+        microarch = self.options.get_safe("microarch")
+        if not microarch:
+            return
+        compiler = str(self.settings.compiler)
+        if compiler == "msvc":
+            if str(microarch) not in self._msvc_arch_flags:
+                raise ConanInvalidConfiguration(f"microarch={microarch} is not supported with msvc")
+            return
+        min_version = self._microarch_min_versions.get(compiler)
+        if min_version is None or Version(self.settings.compiler.version) < min_version:
+            versions = ", ".join(f"{name} >= {version}" for name, version in self._microarch_min_versions.items())
+            raise ConanInvalidConfiguration(f"microarch={microarch} requires {versions}")
+
+    def _microarch_flags(self):
+        microarch = self.options.get_safe("microarch")
+        if not microarch:
+            return []
+        if self.settings.compiler == "msvc":
+            return [self._msvc_arch_flags[str(microarch)]]
+        return [f"-march={microarch}"]
+
     def layout(self):
         cmake_layout(self)
 
@@ -36,6 +75,17 @@ class unitconvertRecipe(ConanFile):
         deps.generate()
         tc = CMakeToolchain(self)
         tc.cache_variables["BUILD_UNIT_TESTS"] = False
+        if self.options.ipo:
+            # let cmake add the lto flags of the compiler. the policy makes it honor
+            # CMAKE_INTERPROCEDURAL_OPTIMIZATION even if the project requires an old cmake.
+            tc.cache_variables["CMAKE_INTERPROCEDURAL_OPTIMIZATION"] = True
+            tc.cache_variables["CMAKE_POLICY_DEFAULT_CMP0069"] = "NEW"
+        tc.extra_cxxflags += self._microarch_flags()
+        # e.g. -c user.cd3:compiler_launcher=ccache
+        launcher = self.conf.get("user.cd3:compiler_launcher")
+        if launcher:
+            tc.cache_variables["CMAKE_C_COMPILER_LAUNCHER"] = launcher
+            tc.cache_variables["CMAKE_CXX_COMPILER_LAUNCHER"] = launcher
         tc.generate()
 
     def source(self):
@@ -70,3 +120,8 @@ class unitconvertRecipe(ConanFile):
         self.cpp_info.set_property("cmake_file_name", "UnitConvert")
         self.cpp_info.set_property("cmake_target_name", "UnitConvert::UnitConvert")
         self.cpp_info.libs = ["UnitConvert"]
+        if self.options.ipo and not self.options.shared and self.settings.compiler in ["gcc", "clang", "apple-clang"]:
+            # a static library built with lto only contains the compiler's intermediate
+            # representation, which has to be optimized when the consumer is linked.
+            self.cpp_info.exelinkflags = ["-flto"]
+            self.cpp_info.sharedlinkflags = ["-flto"]
@@ -0,0 +1,86 @@
+'''
+Tests for the noise-aware benchmark regression check, with an in-memory database.
+'''
+import itertools
+
+import pytest
+
+from cd3_conan_package_recipes import benchmark_history
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # every run is recorded one second after the one before it
+    clock = itertools.count(1000)
+    monkeypatch.setattr(benchmark_history.time, "time", lambda: next(clock))
+    db = benchmark_history.open_db(":memory:")
+    yield db
+    db.close()
+
+
+def bench(samples, higher_is_better=True):
+    return {'parse':{'unit':"items/s", 'higher_is_better':higher_is_better, 'samples':samples}}
+
+
+def record(db, medians, higher_is_better=True, status="pass"):
+    for median in medians:
+        benchmark_history.record_run(db, "host", "lib/1.0", "id", bench([median], higher_is_better),
+                                     statuses={} if status == "pass" else {'parse':status})
+
+
+def find(db, samples, higher_is_better=True, **kwargs):
+    return benchmark_history.find_regressions(db, "host", "lib/1.0", "id", bench(samples, higher_is_better), **kwargs)
+
+
+def test_stable_benchmark_regresses(db):
+    record(db, [100, 101, 99, 100, 100])
+
+    regressions, new = find(db, [80, 80, 81])
+
+    assert new == []
+    assert len(regressions) == 1
+    assert regressions[0]['baseline'] == 100 and regressions[0]['change'] == pytest.approx(-0.2)
+    assert regressions[0]['allowed'] == pytest.approx(0.10)
+
+
+def test_noisy_benchmark_within_noise(db):
+    # a relative median absolute deviation of 10% allows 30% with the default noise factor
+    record(db, [100, 80, 120, 90, 110])
+
+    regressions, new = find(db, [78, 78, 78])
+
+    assert regressions == [] and new == []
+    # the same change is a regression for a stable benchmark
+    assert len(find(db, [78, 78, 78], noise_factor=0.0)[0]) == 1
+
+
+def test_noisy_samples_within_noise(db):
+    record(db, [100, 100, 100, 100, 100])
+
+    regressions, new = find(db, [60, 85, 110])
+
+    assert regressions == []
+
+
+def test_lower_is_better(db):
+    record(db, [10, 10, 10], higher_is_better=False)
+
+    assert find(db, [9], higher_is_better=False)[0] == []
+    assert len(find(db, [12], higher_is_better=False)[0]) == 1
+
+
+def test_too_little_history(db):
+    record(db, [100, 100])
+    # regressed runs are not part of the baseline
+    record(db, [50], status="regressed")
+
+    regressions, new = find(db, [50], min_history=3)
+
+    assert regressions == [] and new == ["parse"]
+
+
+def test_window(db):
+    record(db, [50, 50, 50, 100, 100, 100])
+
+    assert len(find(db, [80], window=3)[0]) == 1
+    assert find(db, [80], window=6)[0] == []
@@ -0,0 +1,70 @@
+'''
+Tests for the build time history, with an in-memory database.
+'''
+import itertools
+
+import pytest
+
+from cd3_conan_package_recipes import history
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # every run is recorded one second after the one before it
+    clock = itertools.count(1000)
+    monkeypatch.setattr(history.time, "time", lambda: next(clock))
+    db = history.open_db(":memory:")
+    yield db
+    db.close()
+
+
+def record(db, durations, name="lib/1.0", test="test_package", phase="build", status="pass", profile_hash="p"):
+    for duration in durations:
+        history.record_results(db, [{'name':name, 'test':test, 'status':status, 'phases':{phase:duration}}],
+                               profile_hash=profile_hash, cpu_count=4)
+
+
+def test_find_regressions_reports_slower_run(db):
+    record(db, [10, 11, 9, 10, 10, 14])
+
+    regressions = history.find_regressions(db, threshold=0.25)
+
+    assert len(regressions) == 1
+    assert regressions[0]['reference'] == "lib/1.0" and regressions[0]['phase'] == "build"
+    assert regressions[0]['baseline'] == 10 and regressions[0]['change'] == pytest.approx(0.4)
+
+
+def test_find_regressions_ignores_small_changes_and_failures(db):
+    record(db, [10, 11, 9, 10, 10, 12])
+    record(db, [30], status="fail")
+
+    assert history.find_regressions(db, threshold=0.25) == []
+
+
+def test_find_regressions_needs_history(db):
+    record(db, [10, 10, 20])
+    # a different profile is not part of the history
+    record(db, [10, 10, 10], profile_hash="other")
+
+    assert history.find_regressions(db, min_history=3) == []
+    assert len(history.find_regressions(db, min_history=2)) == 1
+
+
+def test_find_regressions_only_uses_window(db):
+    record(db, [100, 100, 100, 10, 10, 10, 14])
+
+    assert len(history.find_regressions(db, window=3, min_history=3)) == 1
+    assert history.find_regressions(db, window=6, min_history=3) == []
+
+
+def test_get_expected_durations(db):
+    # the phases of a run are summed, and the median of the last `window` runs is used
+    for build, test in [(100, 10), (5, 1), (6, 2), (7, 1)]:
+        history.record_results(db, [{'name':"lib/1.0", 'test':"test_package", 'status':"pass",
+                                     'phases':{'build':build, 'test':test}}], profile_hash="p")
+    record(db, [50], name="lib/1.0", status="fail")
+    record(db, [3], name="other/1.0", test="prebuild")
+
+    assert history.get_expected_durations(db, "test_package", window=3) == {"lib/1.0":8}
+    assert history.get_expected_durations(db, "test_package", profile_hash="other") == {}
+    assert history.get_expected_durations(db, "prebuild") == {"other/1.0":3}
@@ -0,0 +1,62 @@
+'''
+Tests for the recipe index and the dependency graph the recipes are exported in.
+'''
+from cd3_conan_package_recipes import recipe_index
+
+
+def write_config_recipe(root, name, versions, conanfile):
+    (root/name/"all").mkdir(parents=True)
+    (root/name/"config.yml").write_text("versions:\n" + "".join(f'  "{v}":\n    folder: all\n' for v in versions))
+    (root/name/"all"/"conanfile.py").write_text(conanfile)
+
+
+def write_custom_recipe(root, name, conanfile):
+    (root/name).mkdir(parents=True)
+    (root/name/"conanfile.py").write_text(conanfile)
+
+
+def test_build_index_and_graph(tmp_path):
+    root = tmp_path/"recipes"
+    write_custom_recipe(root, "base", 'class Base:\n    name = "base"\nversion = "0.1"\n')
+    write_custom_recipe(root, "lib", 'import os\n'
+                                     'class Lib:\n'
+                                     '    python_requires = "base/0.1@" + os.environ.get("USER_CHANNEL", "cd3/devel")\n'
+                                     'version = "1.0"\n')
+    write_config_recipe(root, "dep", ["1.0", "2.0"], 'class Dep:\n    pass\n')
+    write_config_recipe(root, "app", ["1.0"], 'class App:\n'
+                                              '    def requirements(self):\n'
+                                              '        self.requires("lib/1.0")\n'
+                                              '        self.requires(f"dep/{self.version}")\n'
+                                              '        self.tool_requires("cmake/[>=3.16]")\n')
+
+    recipes = {r.reference:r for r in recipe_index.build_index(root)}
+
+    assert sorted(recipes) == ["app/1.0", "base/0.1", "dep/1.0", "dep/2.0", "lib/1.0"]
+    assert recipes["lib/1.0"].requirements == [("python_requires", "base/0.1@")]
+    assert recipes["app/1.0"].requirements == [("requires", "lib/1.0"), ("requires", "dep/"), ("tool_requires", "cmake/[>=3.16]")]
+
+    graph = recipe_index.build_dependency_graph(list(recipes.values()))
+
+    # an exact version depends on that version only, anything else on every version
+    assert graph == {"app/1.0":{"lib/1.0", "dep/1.0", "dep/2.0"}, "base/0.1":set(), "dep/1.0":set(),
+                     "dep/2.0":set(), "lib/1.0":{"base/0.1"}}
+
+
+def test_get_dependents():
+    graph = {"app/1.0":{"lib/1.0", "dep/1.0"}, "lib/1.0":{"base/0.1"}, "base/0.1":set(),
+             "dep/1.0":set(), "other/1.0":set()}
+
+    assert recipe_index.get_dependents(graph, ["base/0.1"]) == {"base/0.1", "lib/1.0", "app/1.0"}
+    assert recipe_index.get_dependents(graph, ["dep/1.0"]) == {"dep/1.0", "app/1.0"}
+    assert recipe_index.get_dependents(graph, ["other/1.0"]) == {"other/1.0"}
+
+
+def test_load_index_reuses_cache(tmp_path):
+    root = tmp_path/"recipes"
+    write_custom_recipe(root, "lib", 'version = "1.0"\n')
+    cache_file = tmp_path/"cache.json"
+
+    assert [r.reference for r in recipe_index.load_index(root, cache_file)] == ["lib/1.0"]
+    (root/"lib"/"conanfile.py").write_text('version = "1.1"\n')
+
+    assert [r.reference for r in recipe_index.load_index(root, cache_file)] == ["lib/1.1"]
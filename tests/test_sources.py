@@ -0,0 +1,141 @@
+'''
+Tests for downloading sources into the store, against a local HTTP server.
+'''
+import http.server
+import threading
+import functools
+import hashlib
+
+import pytest
+
+from cd3_conan_package_recipes import sources
+
+
+@pytest.fixture
+def server(tmp_path):
+    '''
+    Serve the files in tmp_path/"www" and yield the base url.
+    '''
+    root = tmp_path/"www"
+    root.mkdir()
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=str(root)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", root
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_archive(root, name, content):
+    (root/name).write_bytes(content)
+    return hashlib.sha256(content).hexdigest()
+
+
+def test_fetch_stores_file_under_sha256(server, tmp_path):
+    url, root = server
+    sha256 = make_archive(root, "lib-1.0.tar.gz", b"archive contents")
+    store = tmp_path/"store"
+
+    result = sources.fetch({'sha256':sha256, 'urls':[f"{url}/lib-1.0.tar.gz"]}, store, retries=0)
+
+    assert result['status'] == "downloaded"
+    assert result['size'] == len(b"archive contents")
+    assert (store/"s"/sha256).read_bytes() == b"archive contents"
+    assert list((store/"s").iterdir()) == [store/"s"/sha256]
+
+
+def test_fetch_falls_back_to_next_url(server, tmp_path):
+    url, root = server
+    sha256 = make_archive(root, "mirror.tar.gz", b"archive contents")
+    store = tmp_path/"store"
+
+    result = sources.fetch({'sha256':sha256, 'urls':[f"{url}/missing.tar.gz", f"{url}/mirror.tar.gz"]}, store, retries=0)
+
+    assert result['status'] == "downloaded"
+    assert len(result['errors']) == 1
+    assert "missing.tar.gz" in result['errors'][0] and "404" in result['errors'][0]
+    assert (store/"s"/sha256).exists()
+
+
+def test_fetch_rejects_sha256_mismatch(server, tmp_path):
+    url, root = server
+    make_archive(root, "lib-1.0.tar.gz", b"tampered contents")
+    sha256 = hashlib.sha256(b"archive contents").hexdigest()
+    store = tmp_path/"store"
+
+    result = sources.fetch({'sha256':sha256, 'urls':[f"{url}/lib-1.0.tar.gz"]}, store, retries=0)
+
+    assert result['status'] == "failed"
+    assert "sha256 mismatch" in result['errors'][0]
+    # neither the file nor the partial download are left in the store
+    assert list((store/"s").iterdir()) == []
+
+
+def test_fetch_skips_present_file(server, tmp_path):
+    url, root = server
+    sha256 = make_archive(root, "lib-1.0.tar.gz", b"archive contents")
+    store = tmp_path/"store"
+    sources.fetch({'sha256':sha256, 'urls':[f"{url}/lib-1.0.tar.gz"]}, store, retries=0)
+    (root/"lib-1.0.tar.gz").unlink()
+
+    result = sources.fetch({'sha256':sha256, 'urls':[f"{url}/lib-1.0.tar.gz"]}, store, retries=0)
+
+    assert result['status'] == "present"
+
+
+def test_prefetch_adds_references(server, tmp_path):
+    url, root = server
+    a = make_archive(root, "a.tar.gz", b"a")
+    b = make_archive(root, "b.tar.gz", b"b")
+    store = tmp_path/"store"
+    srcs = [{'sha256':a, 'urls':[f"{url}/a.tar.gz"], 'references':["a/1.0"]},
+            {'sha256':b, 'urls':[f"{url}/missing.tar.gz"], 'references':["b/1.0", "b/1.1"]}]
+
+    results = {r['sha256']:r for r in sources.prefetch(srcs, store, jobs=2, retries=0)}
+
+    assert results[a]['status'] == "downloaded" and results[a]['references'] == ["a/1.0"]
+    assert results[b]['status'] == "failed" and results[b]['references'] == ["b/1.0", "b/1.1"]
+    assert sorted(p.name for p in (store/"s").iterdir()) == [a]
+
+
+def test_get_sources_merges_urls_by_sha256(tmp_path):
+    recipes = tmp_path/"recipes"
+    (recipes/"lib"/"all").mkdir(parents=True)
+    (recipes/"lib"/"all"/"conandata.yml").write_text(
+        'sources:\n'
+        '  "1.0":\n'
+        '    url: ["https://a/lib-1.0.tar.gz", "https://b/lib-1.0.tar.gz"]\n'
+        '    sha256: "abc"\n'
+        '  "1.1":\n'
+        '    url: "https://a/lib-1.0.tar.gz"\n'
+        '    sha256: "abc"\n'
+        '  "2.0":\n'
+        '    git: "https://a/lib"\n'
+        '    ref: "2.0"\n')
+
+    found = sources.get_sources([recipes])
+
+    assert found == [{'sha256':"abc", 'urls':["https://a/lib-1.0.tar.gz", "https://b/lib-1.0.tar.gz"],
+                      'references':["lib/1.0", "lib/1.1"]}]
+
+
+def test_get_unverified_sources(tmp_path):
+    recipes = tmp_path/"recipes"
+    (recipes/"lib"/"all").mkdir(parents=True)
+    (recipes/"lib"/"all"/"conandata.yml").write_text(
+        'sources:\n'
+        '  "1.0":\n'
+        '    url: "https://a/lib-1.0.tar.gz"\n'
+        '    sha256: "abc"\n'
+        '  "1.1":\n'
+        '    url: "https://a/lib-1.1.tar.gz"\n'
+        '  "2.0":\n'
+        '    git: "https://a/lib"\n'
+        '    ref: "v2.0"\n')
+
+    assert sources.get_unverified_sources([recipes]) == [("lib/1.1", "url without sha256"), ("lib/2.0", "git fetch of v2.0")]
@@ -0,0 +1,135 @@
+from pathlib import Path
+import urllib.error
+import subprocess
+import sys
+import re
+from argparse import ArgumentParser
+
+top_dir = Path(__file__).absolute().parent.parent
+sys.path.insert(0, str(top_dir))
+from cd3_conan_package_recipes.recipe_index import load_yaml
+from cd3_conan_package_recipes import sources
+
+parser = ArgumentParser(description="Write the source of a recipe version to the conandata.yml next to it, as a checksum-verified release archive, or as a shallow fetch of a single git ref if there is no archive.")
+
+parser.add_argument("conanfile",
+                    action="store",
+                    nargs='+',
+                    help="Recipe(s) to generate the conandata.yml entry for. The version, repository and ref are read from the `version`, `git_url_basename` and `checkout` attributes of the recipe, or from an existing entry.",)
+parser.add_argument("--version",
+                    action="store",
+                    default=None,
+                    help="Version to write the entry for.",)
+parser.add_argument("--repo",
+                    action="store",
+                    default=None,
+                    help="URL of the github repository to get the source from.",)
+parser.add_argument("--ref",
+                    action="store",
+                    default=None,
+                    help="Tag to get the source for.",)
+parser.add_argument("--shallow",
+                    action="store_true",
+                    help="Do not look for a release archive, write a shallow fetch of the ref.",)
+parser.add_argument("--check",
+                    action="store_true",
+                    help="Do not download anything, list the entries of the recipes that are not checksum-verified and fail if there are any.",)
+parser.add_argument("--timeout",
+                    action="store",
+                    type=float,
+                    default=60,
+                    help="Timeout for downloading the archive in seconds.",)
+
+
+args = parser.parse_args()
+
+
+def get_attribute(text, name):
+    match = re.search(rf'''^\s*{name}\s*=\s*["']([^"']*)["']''', text, flags=re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def dump_yaml(data, indent=0):
+    '''
+    Format nested dicts and lists of strings the way the conandata.yml files in this repository are written.
+    '''
+    lines = []
+    for key, value in data.items():
+        if isinstance(value, dict):
+            lines.append(" "*indent + f'"{key}":' if indent else f"{key}:")
+            lines += dump_yaml(value, indent+8)
+        elif isinstance(value, list):
+            lines.append(" "*indent + f'{key}:')
+            lines += [" "*(indent+4) + f'- "{item}"' for item in value]
+        else:
+            lines.append(" "*indent + f'{key}: "{value}"')
+    return lines
+
+
+def get_entry(repo, ref):
+    if not args.shallow:
+        url = f"{repo}/archive/refs/tags/{ref}.tar.gz"
+        try:
+            sha256, size = sources.download(url, None, args.timeout)
+            return {'url':url, 'sha256':sha256}
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                print(f"  Could not download {url} ({e}). Leaving the entry unchanged.")
+                return None
+            print(f"  There is no release archive for {ref} ({e}). Falling back to a shallow fetch of {ref}.")
+        except OSError as e:
+            # only fall back when the archive does not exist. a network error would otherwise
+            # turn an entry that could be checksum-verified into a git fetch.
+            print(f"  Could not download {url} ({e}). Leaving the entry unchanged, use --shallow to write a git fetch anyway.")
+            return None
+    result = subprocess.run(['git', 'ls-remote', '--exit-code', repo, ref], capture_output=True, text=True)
+    if result.returncode:
+        print(f"  WARNING: could not find {ref} in {repo}.")
+    return {'git':repo, 'ref':ref}
+
+
+failed = 0
+for conanfile in args.conanfile:
+    conanfile = Path(conanfile)
+    if conanfile.is_dir():
+        conanfile = conanfile/"conanfile.py"
+    text = conanfile.read_text()
+    conandata_file = conanfile.parent/"conandata.yml"
+    conandata = load_yaml(conandata_file) if conandata_file.exists() else {}
+
+    if args.check:
+        for version, entry in (conandata.get("sources") or {}).items():
+            if isinstance(entry, dict) and not entry.get("sha256"):
+                print(f"{conandata_file} ({version}): no sha256, regenerate it with {sys.argv[0]} {conanfile.parent} --version {version}")
+                failed += 1
+        continue
+
+    version = args.version or get_attribute(text, "version")
+    if version is None:
+        print(f"Could not determine the version of {conanfile}. Use --version.")
+        failed += 1
+        continue
+    existing = (conandata.get("sources") or {}).get(version) or {}
+
+    # an entry that has a release archive but no checksum yet
+    archive = re.match(r"(https://github\.com/[^/]+/[^/]+)/archive/refs/tags/(.+)\.tar\.gz$", existing.get("url") or "")
+    ref = args.ref or existing.get("ref") or (archive and archive.group(2)) or get_attribute(text, "checkout") or version
+    repo = args.repo or existing.get("git") or (archive and archive.group(1))
+    if repo is None:
+        basename = get_attribute(text, "git_url_basename")
+        if basename is None:
+            print(f"Could not determine the repository of {conanfile}. Use --repo.")
+            failed += 1
+            continue
+        # git:// is no longer served by github
+        repo = re.sub("^git://", "https://", basename).rstrip("/") + "/" + get_attribute(text, "name")
+
+    print(f"{conanfile} ({version}): {repo} {ref}")
+    entry = get_entry(repo, ref)
+    if entry is None:
+        failed += 1
+        continue
+    conandata.setdefault("sources", {})[version] = entry
+    conandata_file.write_text("\n".join(dump_yaml(conandata)) + "\n")
+
+sys.exit(1 if failed else 0)
@@ -1,9 +1,22 @@
 from pathlib import Path
 import subprocess
-import itertools
+import hashlib
+import shlex
+import json
 import os
+import sys
 from argparse import ArgumentParser
 
+top_dir = Path(__file__).absolute().parent.parent
+sys.path.insert(0, str(top_dir))
+from cd3_conan_package_recipes.conan_driver import BACKENDS, get_driver, get_conan_version, get_file_name, split_user_channel
+from cd3_conan_package_recipes.recipe_index import load_index
+from cd3_conan_package_recipes import matrix
+from cd3_conan_package_recipes import lockfiles
+from cd3_conan_package_recipes import base_recipe
+from cd3_conan_package_recipes import history
+from cd3_conan_package_recipes.reporting import PhaseTimer
+
 parser = ArgumentParser(description="Test some or all of the conan package references contained in this repository.")
 
 parser.add_argument("name",
@@ -14,59 +27,195 @@ parser.add_argument("--user-channel-string",
                     action="store",
                     default="cd3/devel",
                     help="Specify the user/channel string to export packages too.",)
+parser.add_argument("--backend",
+                    action="store",
+                    choices=BACKENDS,
+                    default="auto",
+                    help="Run conan commands in-process with the conan API, or with the conan CLI. 'auto' uses the API if it is available.",)
+parser.add_argument("-pr", "--profile",
+                    action="append",
+                    default=[],
+                    help="Test with this profile. Give it more than once to test a matrix of profiles, e.g. -pr gcc -pr clang.",)
+parser.add_argument("--settings-variant",
+                    action="append",
+                    default=[],
+                    help="Comma separated settings to test with, e.g. build_type=Debug. Give it more than once to test a matrix of settings.",)
+parser.add_argument("--options-variant",
+                    action="append",
+                    default=[],
+                    help="Comma separated options to test with, e.g. *:shared=True. Give it more than once to test a matrix of options.",)
+parser.add_argument("--lockfile-dir",
+                    action="store",
+                    default=str(top_dir/".lockfiles"),
+                    help="Directory the lockfile of each reference is stored in and reused from.",)
+parser.add_argument("--refresh-lockfiles",
+                    action="store_true",
+                    help="Resolve the version ranges of every reference again, instead of reusing the stored lockfiles.",)
+parser.add_argument("--history-db",
+                    action="store",
+                    default=str(top_dir/".build-times.sqlite"),
+                    help="SQLite database the duration of each phase is appended to, the same one .dev/run-package-tests.py uses.",)
+parser.add_argument("--no-history",
+                    action="store_true",
+                    help="Do not record the durations of this run.",)
 
 
 args = parser.parse_args()
 
 results = []
+# the timings of every test and build, recorded in the history database like the ones of
+# .dev/run-package-tests.py (see reporting.write_json for the format).
+timings = []
+log_dir = top_dir/"test-output"/"test-recipes"
+log_dir.mkdir(parents=True, exist_ok=True)
+
+driver = get_driver(args.backend)
 
-profiles = subprocess.check_output(['conan', 'profile', 'list'])
-if profiles.startswith(b"No profiles defined"):
+if driver.run(['profile', 'path', 'default']).returncode:
     print("Creating default profile")
-    subprocess.run(['conan','profile','new','default','--detect'])
-    subprocess.run(['conan','profile','update','settings.compiler.libcxx=libstdc++11','default'])
-
-for file in Path("recipes").glob("*/config.yml"):
-    try:
-        import yaml
-    except: print(f"ERROR: could not import pyyaml which is required to parse {str(file)}.")
-
-    data = yaml.safe_load( file.read_text() )
-    root_dir = file.parent
-    name = root_dir.stem
-    if len(args.name) > 0 and (name not in args.name):
+    driver.run(['profile','detect'])
+
+# the legacy recipes load their python_requires from the cache, so it has to be exported
+# to the same user/channel before them.
+if base_recipe.export_base_recipe(driver, args.user_channel_string) == "failed":
+    results.append(f"FAIL: conan export {base_recipe.BASE_RECIPE} {base_recipe.BASE_REFERENCE}@{args.user_channel_string}")
+
+
+def run_timed(cmd, name):
+    '''
+    Run a conan command, showing its output as usual, and return the result and the
+    time spent in each phase. The output is also written to a log file in log_dir.
+    '''
+    log_file = log_dir/(get_file_name(name)+".log")
+    log_file.write_text("")
+    timer = PhaseTimer("graph")
+    def on_line(line):
+        # sys.stdout is redirected to the log file while the API driver runs a command
+        sys.__stdout__.write(line)
+        timer.on_line(line)
+    r = driver.run(cmd, log_file=log_file, on_line=on_line)
+    return r, timer.stop(), log_file
+
+
+def get_profile_hash(combination_args):
+    profile = driver.run_json(['profile', 'show'] + combination_args)
+    return hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest() if profile else None
+
+
+tests = []
+for recipe in load_index("recipes", top_dir/".recipe-index-cache.json"):
+    if recipe.layout != "config":
         continue
-    for version in data.get("versions",{}):
-        name = root_dir.stem
-        folder = str(data["versions"][version].get('folder',None))
-        if folder:
-            folder = root_dir/folder
-
-            cmd = ['conan', 'export', str(folder), f"{name}/{version}@{args.user_channel_string}"]
-            print(f"Exporting {name} version {version} with command '{' '.join(cmd)}'.")
-            result = subprocess.run(cmd)
-            if result.returncode:
-                name = name.lower()
-                cmd = ['conan', 'export', str(folder), f"{name}/{version}@{args.user_channel_string}"]
-                print(f"Export failed. Trying again with command '{' '.join(cmd)}'.")
-                result = subprocess.run(cmd)
-
-
-            test_dirs = filter(lambda x: x.is_dir(),  (folder/"_test_package").glob("*"))
-            if (folder/"test_package").exists():
-                test_dirs = itertools.chain(test_dirs, [folder/"test_package"])
-
-            for test_dir in test_dirs:
-                cmd = ['conan','test',str(test_dir),f"{name}/{version}@{args.user_channel_string}",'--build','missing']
-                print(cmd)
-                r = subprocess.run(cmd)
-                if r.returncode:
-                    results.append(f"FAIL: {' '.join(cmd)}")
-                else:
-                    results.append(f"PASS: {' '.join(cmd)}")
+    if len(args.name) > 0 and (recipe.name not in args.name):
+        continue
+    name = recipe.name
+    version = recipe.version
+    folder = Path(recipe.folder)
+
+    cmd = ['export', str(folder), '--name', name, '--version', version] + split_user_channel(args.user_channel_string)
+    cmd += lockfiles.get_lockfile_args(lockfiles.get_lockfile(args.lockfile_dir, f"{name}/{version}@{args.user_channel_string}"))
+    print(f"Exporting {name} version {version} with command 'conan {' '.join(cmd)}'.")
+    result = driver.run(cmd)
+    if result.returncode:
+        name = name.lower()
+        cmd = ['export', str(folder), '--name', name, '--version', version] + split_user_channel(args.user_channel_string)
+        cmd += lockfiles.get_lockfile_args(lockfiles.get_lockfile(args.lockfile_dir, f"{name}/{version}@{args.user_channel_string}"))
+        print(f"Export failed. Trying again with command 'conan {' '.join(cmd)}'.")
+        result = driver.run(cmd)
+
+    for test_dir in recipe.test_folders:
+        tests.append((f"{name}/{version}@{args.user_channel_string}", test_dir))
+
+# lock the graph of every reference in one step. every command below reads the graph
+# from the lockfile instead of resolving the version ranges again.
+locked, statuses = lockfiles.lock_references(driver, sorted(set(reference for reference, test_dir in tests)), args.lockfile_dir,
+                                             refresh=args.refresh_lockfiles)
+for reference, status in statuses.items():
+    print(f"{status.capitalize()} lockfile for {reference}.")
+
+# every combination of a profile, settings and options. without any, every test runs once
+# with the default profile.
+combinations = matrix.get_combinations(args.profile, args.settings_variant, args.options_variant)
+
+profile_hashes = {label:get_profile_hash(combination_args) for label, combination_args in combinations}
+
+# binaries that failed to build, and the binaries each (reference, combination) needs.
+failed = set()
+binaries = {}
+conan_version = get_conan_version(driver)
+if len(combinations) > 1 and conan_version and conan_version < matrix.MIN_CONAN_VERSION:
+    # each test builds the binaries it is missing, so a binary shared between combinations
+    # is built by the first test that needs it.
+    print(f"WARNING: sharing the builds between combinations needs conan {'.'.join(map(str, matrix.MIN_CONAN_VERSION))} or newer, found {'.'.join(map(str, conan_version))}. Testing each combination on its own.")
+elif len(combinations) > 1:
+    # compute the package_ids of the whole matrix without building anything, and build
+    # each distinct binary once before any test runs.
+    orders = []
+    for reference in sorted(set(reference for reference, test_dir in tests)):
+        for label, combination_args in combinations:
+            lock_args = lockfiles.get_lockfile_args(locked.get(reference))
+            cmd = ['graph', 'build-order', '--requires', reference, '--build', 'missing', '--order-by', 'configuration'] + combination_args + lock_args
+            order = driver.run_json(cmd)
+            if order is None:
+                results.append(f"FAIL: conan {' '.join(cmd)}")
+                binaries[(reference, label)] = None
+                continue
+            orders.append((label, combination_args + lock_args, order))
+            binaries[(reference, label)] = matrix.get_binaries(order)
+    levels = matrix.merge_build_orders(orders)
+    total = sum(len(b) for b in binaries.values() if b)
+    unique = len(set(b for bs in binaries.values() if bs for b in bs))
+    print(f"{len(combinations)} combinations of {len(set(r for r, d in tests))} references need {total} binaries, {unique} of them distinct. {sum(len(l) for l in levels)} have to be built.")
+    for level in levels:
+        for item in level:
+            cmd = ['install'] + shlex.split(item['build_args']) + item['combination_args']
+            if failed.intersection(item['depends']):
+                failed.add(item['pref'])
+                results.append(f"SKIP: conan {' '.join(cmd)}")
+                continue
+            print(cmd)
+            r, phases, log_file = run_timed(cmd, item['pref'])
+            timings.append({'name':item['ref'].split("#")[0], 'package_id':item['package_id'], 'test':"prebuild",
+                            'status':"fail" if r.returncode else "pass", 'duration':sum(phases.values()),
+                            'phases':{'dependency_build':sum(phases.values())}, 'log_file':log_file,
+                            'profile_hash':profile_hashes[item['combination_label']]})
+            if r.returncode:
+                failed.add(item['pref'])
+                results.append(f"FAIL: conan {' '.join(cmd)}")
+            else:
+                results.append(f"PASS: conan {' '.join(cmd)}")
+
+for reference, test_dir in tests:
+    for label, combination_args in combinations:
+        needed = binaries.get((reference, label), [])
+        if needed is None or failed.intersection(needed):
+            # the graph could not be computed or a binary failed to build. the test would
+            # only try to build it again.
+            results.append(f"SKIP: conan test {test_dir} {reference} ({label})")
+            continue
+        cmd = ['test',str(test_dir),reference,'--build','missing'] + combination_args + lockfiles.get_lockfile_args(locked.get(reference))
+        print(cmd)
+        # the test_package runs have the same name as in .dev/run-package-tests.py, so
+        # they feed the same duration estimates. the combination is part of the profile hash.
+        test = "test_package" if Path(test_dir).name == "test_package" else str(Path(test_dir).relative_to(Path(test_dir).parent.parent))
+        r, phases, log_file = run_timed(cmd, f"{reference} {test} {label}")
+        timings.append({'name':reference, 'test':test, 'status':"fail" if r.returncode else "pass",
+                        'duration':sum(phases.values()), 'phases':phases, 'log_file':log_file,
+                        'profile_hash':profile_hashes[label]})
+        if r.returncode:
+            results.append(f"FAIL: conan {' '.join(cmd)}")
+        else:
+            results.append(f"PASS: conan {' '.join(cmd)}")
 
 
 
 
 for r in results:
     print(r)
+
+if not args.no_history:
+    git_commit = subprocess.run(['git','rev-parse','HEAD'], capture_output=True, text=True, cwd=top_dir).stdout.strip() or None
+    db = history.open_db(args.history_db)
+    for profile_hash in set(profile_hashes.values()):
+        history.record_results(db, [r for r in timings if r['profile_hash'] == profile_hash], git_commit=git_commit, profile_hash=profile_hash)
+    db.close()